@@ -0,0 +1,57 @@
+import logging
+
+import imaging
+
+logger = logging.getLogger(__name__)
+
+# Edge density below which a frame counts as a plain scene (wall, floor)
+# and above which as a busy one (street, crowd), see imaging.edge_density
+SIMPLE_SCENE = 0.03
+BUSY_SCENE = 0.12
+
+# Uplink throughput (bytes/s) at which quality is at its minimum / maximum
+SLOW_UPLINK = 50_000
+FAST_UPLINK = 500_000
+
+# The vision model tiles "high" detail images in 512 px squares, anything
+# up to 512 px is sent as "low" (fixed, cheapest token cost)
+LOW_DETAIL_MAX = 512
+
+
+def _between(low, high, position):
+    position = min(1.0, max(0.0, position))
+    return low + (high - low) * position
+
+
+class AdaptiveEncoder:
+    # Picks the target size, JPEG quality and detail level of each frame:
+    # plain scenes get fewer pixels, a slow uplink gets a lower quality.
+    # min_size and min_quality bound how far it goes, below them obstacles
+    # start to blur into the background.
+
+    def __init__(self, min_size=384, max_size=512, min_quality=60, max_quality=85):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+
+    def choose(self, image_bytes, throughput=None):
+        edges = imaging.edge_density(image_bytes) if imaging.pillow_available() else None
+        if edges is None:
+            side = self.max_size
+        else:
+            position = (edges - SIMPLE_SCENE) / (BUSY_SCENE - SIMPLE_SCENE)
+            # Multiples of 32 keep the JPEG blocks and DCT scaling aligned
+            side = int(_between(self.min_size, self.max_size, position)) // 32 * 32
+            side = max(self.min_size, side)
+        if throughput is None:
+            quality = self.max_quality
+        else:
+            position = (throughput - SLOW_UPLINK) / (FAST_UPLINK - SLOW_UPLINK)
+            quality = int(_between(self.min_quality, self.max_quality, position))
+        return {
+            "target_size": f"{side}x{side}",
+            "quality": quality,
+            "detail": "low" if side <= LOW_DETAIL_MAX else "high",
+            "edges": edges,
+        }
@@ -1,14 +1,57 @@
 import os
+
+# Socket.IO server mode ("eventlet" or "threading"). Eventlet needs its green
+# threads patched in before anything else imports socket/threading, so this
+# is read from the real environment, not from .env
+SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "eventlet")
+if SOCKETIO_ASYNC_MODE == "eventlet":
+    import eventlet
+
+    eventlet.monkey_patch()
+
 import requests
 import json
-import base64
+import io
+import itertools
 import logging
+import shlex
 import subprocess
-from datetime import datetime
+import threading
+import time
 from dotenv import load_dotenv
 import imghdr
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import (
+    Flask,
+    Request,
+    Response,
+    abort,
+    render_template,
+    jsonify,
+    request,
+    stream_with_context,
+)
 from flask_cors import CORS
+from flask_socketio import SocketIO, emit, join_room, leave_room
+
+import adaptive
+import deadlines
+import http_clients
+import imaging
+import metrics
+import multiview
+import payloads
+import pipeline
+import providers
+import quality
+import scene_state
+import sessions
+import streaming
+import tts
+import workers
+from camera import CaptureDaemon, UploadCamera, create_camera
+from frame_store import FrameStore
+from instruction_cache import InstructionCache
+from scene_cache import SceneCache
 
 # Set up logging
 logging.basicConfig(
@@ -27,8 +70,12 @@ if not AI71_API_KEY or not OPENAI_API_KEY:
     raise ValueError("API keys not found in .env file")
 
 # API setups
-OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
-FALCON_API_URL = "https://api.ai71.ai/v1/chat/completions"
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+FALCON_API_URL = os.getenv("FALCON_API_URL", "https://api.ai71.ai/v1/chat/completions")
+
+# "two_hop": OpenAI describes the image, Falcon turns it into instructions.
+# "single_hop": one structured OpenAI call returns both.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_hop")
 
 OPENAI_HEADERS = {
     "Content-Type": "application/json",
@@ -40,41 +87,312 @@ FALCON_HEADERS = {
     "Authorization": f"Bearer {AI71_API_KEY}",
 }
 
+# Rate limits per provider: <NAME>_RPM requests and <NAME>_TPM tokens per
+# minute (0: learned from the provider's x-ratelimit-* headers). A call
+# waits for its budget at most RATE_LIMIT_MAX_WAIT seconds, or until its
+# frame's deadline.
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))
+
+# Pooled keep-alive clients, (connect, read) timeouts in seconds per stage
+OPENAI_CLIENT = http_clients.ApiClient(
+    "OpenAI",
+    OPENAI_API_URL,
+    OPENAI_HEADERS,
+    connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "3.05")),
+    read_timeout=float(os.getenv("OPENAI_READ_TIMEOUT", "30")),
+    retries=int(os.getenv("OPENAI_RETRIES", "2")),
+    requests_per_minute=float(os.getenv("OPENAI_RPM", "0")),
+    tokens_per_minute=float(os.getenv("OPENAI_TPM", "0")),
+    max_rate_wait=RATE_LIMIT_MAX_WAIT,
+)
+FALCON_CLIENT = http_clients.ApiClient(
+    "Falcon",
+    FALCON_API_URL,
+    FALCON_HEADERS,
+    connect_timeout=float(os.getenv("FALCON_CONNECT_TIMEOUT", "3.05")),
+    read_timeout=float(os.getenv("FALCON_READ_TIMEOUT", "20")),
+    retries=int(os.getenv("FALCON_RETRIES", "2")),
+    requests_per_minute=float(os.getenv("FALCON_RPM", "0")),
+    tokens_per_minute=float(os.getenv("FALCON_TPM", "0")),
+    max_rate_wait=RATE_LIMIT_MAX_WAIT,
+)
+
+
+def create_provider(name):
+    # Any OpenAI-compatible chat-completions endpoint, configured with
+    # <NAME>_API_URL, <NAME>_API_KEY and optionally <NAME>_MODEL
+    if name == "openai":
+        return providers.Provider(name, OPENAI_CLIENT)
+    if name == "falcon":
+        return providers.Provider(name, FALCON_CLIENT)
+    prefix = name.upper()
+    url = os.getenv(f"{prefix}_API_URL")
+    if not url:
+        raise ValueError(f"{prefix}_API_URL is not set for provider {name}")
+    client = http_clients.ApiClient(
+        name,
+        url,
+        {"Authorization": f"Bearer {os.getenv(f'{prefix}_API_KEY', '')}"},
+        connect_timeout=float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", "3.05")),
+        read_timeout=float(os.getenv(f"{prefix}_READ_TIMEOUT", "30")),
+        retries=int(os.getenv(f"{prefix}_RETRIES", "2")),
+        requests_per_minute=float(os.getenv(f"{prefix}_RPM", "0")),
+        tokens_per_minute=float(os.getenv(f"{prefix}_TPM", "0")),
+        max_rate_wait=RATE_LIMIT_MAX_WAIT,
+    )
+    return providers.Provider(name, client, os.getenv(f"{prefix}_MODEL"))
+
+
+# Providers of each stage, fastest first at runtime. With more than one, a
+# call slower than its provider's p90 is hedged to the next one, for at
+# most HEDGE_BUDGET of the calls.
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+VISION_PROVIDERS = providers.ProviderPool(
+    "vision",
+    [create_provider(name.strip()) for name in os.getenv("VISION_PROVIDERS", "openai").split(",")],
+    HEDGE_BUDGET,
+)
+INSTRUCTION_PROVIDERS = providers.ProviderPool(
+    "instructions",
+    [create_provider(name.strip()) for name in os.getenv("INSTRUCTION_PROVIDERS", "falcon").split(",")],
+    HEDGE_BUDGET,
+)
+
+# Scene change gate: max differing dHash bits (out of 64) for two frames to
+# count as the same scene, and how many recent scenes to remember
+SCENE_CHANGE_THRESHOLD = int(os.getenv("SCENE_CHANGE_THRESHOLD", "6"))
+SCENE_CACHE_SIZE = int(os.getenv("SCENE_CACHE_SIZE", "32"))
+
+# Description -> instructions cache: seconds an entry stays valid, max
+# entries, min word-set similarity for a near-duplicate description to hit,
+# optional sqlite file to keep it across restarts
+INSTRUCTION_CACHE_TTL = float(os.getenv("INSTRUCTION_CACHE_TTL", "300"))
+INSTRUCTION_CACHE_SIZE = int(os.getenv("INSTRUCTION_CACHE_SIZE", "256"))
+INSTRUCTION_CACHE_SIMILARITY = float(os.getenv("INSTRUCTION_CACHE_SIMILARITY", "0.85"))
+INSTRUCTION_CACHE_DB = os.getenv("INSTRUCTION_CACHE_DB")
+
+INSTRUCTIONS_ERROR = "Error analyzing surroundings. Please try again."
+
+# "delta": frames of a continuous capture (live mode, /frames?continuous=1)
+# only send Falcon what changed since the session's previous frame and the
+# hazards already announced, and ask for new hazards only (two_hop mode).
+# An explicit capture always gets full instructions. "stateless": the full
+# description every time. The scene state is forgotten after
+# SCENE_STATE_TTL seconds without a frame.
+INSTRUCTION_MODE = os.getenv("INSTRUCTION_MODE", "delta")
+SCENE_STATE_TTL = float(os.getenv("SCENE_STATE_TTL", "15"))
+
+# What a delta answer says when there is nothing new
+NOTHING_NEW = "NOTHING NEW"
+
+# Camera: "termux", "replay" (CAMERA_SOURCE is a directory of images or a
+# video) or "upload" (frames POSTed to /camera/frame). The capture daemon
+# keeps the last CAPTURE_BUFFER_SIZE frames in memory, capturing at most
+# every CAPTURE_INTERVAL seconds.
+CAMERA_BACKEND = os.getenv("CAMERA_BACKEND", "termux")
+CAMERA_SOURCE = os.getenv("CAMERA_SOURCE")
+CAMERA_ID = int(os.getenv("CAMERA_ID", "0"))  # 0 back camera, 1 front camera
+CAPTURE_DAEMON = os.getenv("CAPTURE_DAEMON", "1") == "1"
+CAPTURE_BUFFER_SIZE = int(os.getenv("CAPTURE_BUFFER_SIZE", "4"))
+CAPTURE_INTERVAL = float(os.getenv("CAPTURE_INTERVAL", "0.5"))
+CAPTURE_TIMEOUT = float(os.getenv("CAPTURE_TIMEOUT", "10"))
+
+# Adaptive encoding: size from scene detail (edge density), JPEG quality
+# from the measured uplink, both bounded below so hazards stay visible.
+# With it off every frame is 512x512 at quality 85.
+ADAPTIVE_ENCODING = os.getenv("ADAPTIVE_ENCODING", "1") == "1"
+ADAPTIVE_MIN_SIZE = int(os.getenv("ADAPTIVE_MIN_SIZE", "384"))
+ADAPTIVE_MAX_SIZE = int(os.getenv("ADAPTIVE_MAX_SIZE", "512"))
+ADAPTIVE_MIN_QUALITY = int(os.getenv("ADAPTIVE_MIN_QUALITY", "60"))
+BASELINE_SIZE = "512x512"
+# Every Nth adaptive frame is also encoded the fixed way to measure the saving
+BYTES_SAVED_SAMPLE = 10
+
+# Quality gate: frames too dark, uniform or blurry are not sent upstream.
+# A single capture retries with a fresh frame up to QUALITY_RETRIES times.
+QUALITY_GATE = os.getenv("QUALITY_GATE", "1") == "1"
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "30"))
+QUALITY_MIN_BRIGHTNESS = float(os.getenv("QUALITY_MIN_BRIGHTNESS", "25"))
+QUALITY_MIN_CONTRAST = float(os.getenv("QUALITY_MIN_CONTRAST", "8"))
+QUALITY_RETRIES = int(os.getenv("QUALITY_RETRIES", "2"))
+
+# Frames uploaded to /frames: max request size
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Sessions: one per client (X-Client-Id header, else the client address for
+# uploads and "camera" for the server camera), forgotten after SESSION_TTL
+# idle seconds
+SESSION_TTL = float(os.getenv("SESSION_TTL", "300"))
+SESSION_LIMIT = int(os.getenv("SESSION_LIMIT", "256"))
+CAMERA_SESSION = "camera"
+
+# Inference runs on INFERENCE_WORKERS threads, sessions served in turn.
+# Past INFERENCE_QUEUE waiting frames new requests get a 503.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "8"))
+INFERENCE_QUEUE = int(os.getenv("INFERENCE_QUEUE", "32"))
+
+# Server: host, port, max concurrent connections (eventlet), debug mode
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5001"))
+SERVER_MAX_CONNECTIONS = int(os.getenv("SERVER_MAX_CONNECTIONS", "256"))
+DEBUG = os.getenv("DEBUG", "0") == "1"
+
+# Live mode: minimum seconds between two camera captures
+LIVE_CAPTURE_INTERVAL = float(os.getenv("LIVE_CAPTURE_INTERVAL", "1.0"))
+
+# "Around me": frames are taken for AROUND_DURATION seconds while the user
+# turns, and the distinct ones (dHash more than AROUND_MIN_DISTANCE bits
+# apart, at most AROUND_MAX_VIEWS) are described in one vision call, as
+# separate images ("images", 85 tokens each) or tiled into one 512x512
+# image ("mosaic", 85 tokens in all but less detail per view)
+AROUND_DURATION = float(os.getenv("AROUND_DURATION", "4"))
+AROUND_MAX_VIEWS = int(os.getenv("AROUND_MAX_VIEWS", "4"))
+AROUND_MIN_DISTANCE = int(os.getenv("AROUND_MIN_DISTANCE", "16"))
+AROUND_LAYOUT = os.getenv("AROUND_LAYOUT", "images")
+AROUND_VIEW_SIZE = "512x512"
+AROUND_COLUMNS = 2
+
+# Preview frames served by /uploads, stored under their content hash: at
+# most FRAME_STORE_MB on disk, none older than FRAME_STORE_MAX_AGE seconds,
+# the most recent FRAME_CACHE_MB of them also in memory
+FRAME_STORE_MB = float(os.getenv("FRAME_STORE_MB", "64"))
+FRAME_STORE_MAX_AGE = float(os.getenv("FRAME_STORE_MAX_AGE", "3600"))
+FRAME_CACHE_MB = float(os.getenv("FRAME_CACHE_MB", "16"))
+
+# Seconds from capture after which an answer is no longer worth waiting for:
+# upstream calls are aborted and a "no fresh data" result returned (0: none)
+FRAME_DEADLINE = float(os.getenv("FRAME_DEADLINE", "10"))
+
+# Speech: command that speaks its last argument (testing/fake_tts.py records
+# instead), and how old a frame may get before its speech is dropped
+TTS_COMMAND = shlex.split(os.getenv("TTS_COMMAND", "termux-tts-speak"))
+TTS_MAX_AGE = float(os.getenv("TTS_MAX_AGE", "10"))
+
+class InMemoryRequest(Request):
+    # Werkzeug spools multipart files over 500 KB to a temporary file, keep
+    # uploaded frames in memory instead (bounded by MAX_CONTENT_LENGTH)
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 CORS(app)
 app.config["UPLOAD_FOLDER"] = "static/uploads"
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE)
 
+LIVE_ROOM = "live"
+live_pipeline = None
+live_clients = set()
+live_lock = threading.Lock()
+live_session = None
+live_scene = scene_state.SceneState(SCENE_STATE_TTL)
 
-def take_photo(
-    camera_id=0,
-    filename="visionAId.jpg",
-    filepath="~/storage/dcim/",
-    resolution="800x600",
-):
-    _path = os.path.join(filepath, filename)
-    _path = os.path.expanduser(_path)  # Expand the ~ in the filepath
-    logger.info(f"Taking photo with camera ID {camera_id} (back camera)")
-    logger.info(f"Saving photo to {_path}")
-    cmd = f"termux-camera-photo -c {camera_id} {_path}"
-    try:
-        subprocess.call(cmd, shell=True)
-        logger.info(f"Photo saved to {_path}")
-        return _path
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error taking photo: {e}")
-        return None
+# A client's new frame supersedes that client's frame still in flight
+client_sessions = sessions.SessionRegistry(FRAME_DEADLINE, SESSION_TTL, SESSION_LIMIT, SCENE_STATE_TTL)
+inference_pool = workers.FairPool(INFERENCE_WORKERS, max_waiting=INFERENCE_QUEUE)
+frame_store = FrameStore(
+    app.config["UPLOAD_FOLDER"],
+    max_bytes=int(FRAME_STORE_MB * 1024 * 1024),
+    max_age=FRAME_STORE_MAX_AGE,
+    memory_bytes=int(FRAME_CACHE_MB * 1024 * 1024),
+)
+metrics.gauge("visionaid_frame_store_bytes", lambda: frame_store.stats()["disk_bytes"], tier="disk")
+metrics.gauge("visionaid_frame_store_bytes", lambda: frame_store.stats()["memory_bytes"], tier="memory")
+
+metrics.gauge("visionaid_sessions", lambda: len(client_sessions))
+metrics.gauge("visionaid_pool_waiting", lambda: inference_pool.waiting)
+metrics.gauge("visionaid_pool_busy", lambda: inference_pool.busy)
+
+adaptive_encoder = adaptive.AdaptiveEncoder(
+    ADAPTIVE_MIN_SIZE, ADAPTIVE_MAX_SIZE, ADAPTIVE_MIN_QUALITY, imaging.JPEG_QUALITY
+)
+encoded_frames = itertools.count()
+
+quality_gate = quality.QualityGate(
+    QUALITY_MIN_SHARPNESS, QUALITY_MIN_BRIGHTNESS, QUALITY_MIN_CONTRAST
+)
+metrics.gauge("visionaid_frame_rejection_ratio", lambda: quality_gate.rejection_rate)
+
+camera = None
+capture_daemon = None
+camera_lock = threading.Lock()
+
+scene_cache = SceneCache(SCENE_CHANGE_THRESHOLD, SCENE_CACHE_SIZE)
+instruction_cache = InstructionCache(
+    INSTRUCTION_CACHE_TTL,
+    INSTRUCTION_CACHE_SIZE,
+    INSTRUCTION_CACHE_SIMILARITY,
+    INSTRUCTION_CACHE_DB,
+)
+metrics.gauge("visionaid_cache_hit_ratio", lambda: scene_cache.hit_rate, cache="scene")
+metrics.gauge(
+    "visionaid_cache_hit_ratio", lambda: instruction_cache.hit_rate, cache="instructions"
+)
+
+speech_worker = tts.SpeechWorker(TTS_COMMAND, TTS_MAX_AGE)
+for outcome in speech_worker.stats:
+    metrics.gauge(
+        "visionaid_speech_utterances",
+        lambda outcome=outcome: speech_worker.stats[outcome],
+        outcome=outcome,
+    )
+
+
+def get_camera():
+    global camera, capture_daemon
+    with camera_lock:
+        if camera is None:
+            camera = create_camera(
+                CAMERA_BACKEND, CAMERA_SOURCE, CAMERA_ID, CAPTURE_INTERVAL
+            )
+            if CAPTURE_DAEMON:
+                capture_daemon = CaptureDaemon(
+                    camera, CAPTURE_BUFFER_SIZE, CAPTURE_INTERVAL
+                ).start()
+    return camera
 
 
-def check_file_size(file_path):
-    size_bytes = os.path.getsize(file_path)
-    size_mb = size_bytes / (1024 * 1024)
+@metrics.timed_function("take_photo")
+def take_photo(newer_than=0):
+    # Newest frame from the capture daemon's ring buffer (newer than the
+    # sequence number `newer_than`), or a direct capture when the daemon is
+    # disabled. Returns the image bytes and the frame's sequence number.
+    current_camera = get_camera()
+    if capture_daemon is None:
+        return current_camera.capture(), 0
+    frame = capture_daemon.latest(newer_than=newer_than, timeout=CAPTURE_TIMEOUT)
+    if frame is None:
+        return None, newer_than
+    return frame.data, frame.seq
+
+
+def take_usable_photo():
+    # A frame rejected by the quality gate is replaced by a fresh one right
+    # away instead of being sent upstream
+    seq = 0
+    for _ in range(QUALITY_RETRIES + 1):
+        image_bytes, seq = take_photo(seq)
+        if not image_bytes:
+            return None, "Failed to take photo"
+        reason = quality_gate.check(image_bytes) if QUALITY_GATE else None
+        if reason is None:
+            return image_bytes, None
+    return None, quality.REJECTION_MESSAGES[reason]
+
+
+@metrics.timed_function("check_image_size")
+def check_image_size(image_bytes):
+    size_mb = len(image_bytes) / (1024 * 1024)
     logger.info(f"Image size: {size_mb:.2f} MB")
     return size_mb
 
 
-def check_image_format(file_path):
+@metrics.timed_function("check_image_format")
+def check_image_format(image_bytes):
     try:
-        image_type = imghdr.what(file_path)
+        image_type = imghdr.what(None, h=image_bytes)
         logger.info(f"Image format: {image_type}")
         return image_type
     except Exception as e:
@@ -82,52 +400,65 @@ def check_image_format(file_path):
         return None
 
 
-def resize_and_encode_image(image_path, target_size="512x512"):
-    resized_filename = f"resized_{os.path.basename(image_path)}"
-    resized_path = os.path.join(app.config["UPLOAD_FOLDER"], resized_filename)
+def choose_encoding(image_bytes):
+    if not ADAPTIVE_ENCODING:
+        return {"target_size": BASELINE_SIZE, "quality": imaging.JPEG_QUALITY, "detail": "low"}
+    with metrics.timed("adaptive_choice"):
+        throughput = VISION_PROVIDERS.primary().client.throughput
+        encoding = adaptive_encoder.choose(image_bytes, throughput)
+    edges = f"{encoding['edges']:.3f}" if encoding["edges"] is not None else "unknown"
+    uplink = f"{throughput / 1000:.0f} KB/s" if throughput else "unknown"
+    logger.info(
+        f"Adaptive encoding: {encoding['target_size']} q{encoding['quality']} "
+        f"(edges {edges}, uplink {uplink})"
+    )
+    return encoding
+
+
+def record_bytes_saved(image_bytes, resized_bytes):
+    baseline_bytes = imaging.resize_image(image_bytes, BASELINE_SIZE)
+    saved = len(baseline_bytes) - len(resized_bytes)
+    metrics.observe("visionaid_bytes_saved", saved)
+    logger.info(f"Adaptive encoding saved {saved} of {len(baseline_bytes)} bytes")
+
+
+def resize_and_encode_bytes(image_bytes):
     try:
-        # Ensure the upload folder exists
-        os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-
-        # Resize image using ImageMagick's magick convert command
-        subprocess.run(
-            [
-                "magick",
-                "convert",
-                image_path,
-                "-resize",
-                target_size + "^",
-                "-gravity",
-                "center",
-                "-extent",
-                target_size,
-                resized_path,
-            ],
-            check=True,
-        )
-        logger.info(f"Image resized and saved to {resized_path}")
+        # Resize in memory (Pillow, ImageMagick as fallback)
+        encoding = choose_encoding(image_bytes)
+        with metrics.timed("resize"):
+            resized_bytes = imaging.resize_image(
+                image_bytes, encoding["target_size"], encoding["quality"]
+            )
+        logger.info(f"Image resized to {encoding['target_size']} ({len(resized_bytes)} bytes)")
+        metrics.observe("visionaid_encoded_bytes", len(resized_bytes), size=encoding["target_size"])
+        if ADAPTIVE_ENCODING and next(encoded_frames) % BYTES_SAVED_SAMPLE == 0:
+            record_bytes_saved(image_bytes, resized_bytes)
 
-        # Read and encode the resized image
-        with open(resized_path, "rb") as image_file:
-            encoded_image = base64.b64encode(image_file.read()).decode("utf-8")
-        logger.info("Image encoded successfully")
-        return encoded_image, resized_filename
+        # The stored copy is only used by the /uploads preview
+        with metrics.timed("store"):
+            resized_filename = frame_store.put(resized_bytes)
+
+        # Base64-encoded only while the vision request is sent
+        image_data = payloads.ImageData(resized_bytes)
+
+        # Scene fingerprint for the change gate, needs Pillow
+        fingerprint = None
+        if imaging.pillow_available():
+            with metrics.timed("fingerprint"):
+                fingerprint = imaging.difference_hash(resized_bytes)
+        return image_data, resized_filename, fingerprint, encoding
     except subprocess.CalledProcessError as e:
         logger.error(f"Error resizing image: {e}")
-        return None, None
+        return None, None, None, None
     except Exception as e:
         logger.error(f"Error encoding image: {e}")
-        return None, None
+        return None, None, None, None
 
 
-def generate_image_description(image_path):
+def generate_image_description(image_data, deadline=None, detail="low"):
     logger.info("OpenAI: Generating image description")
 
-    base64_image, resized_filename = resize_and_encode_image(image_path)
-    if not base64_image:
-        logger.error("Failed to resize and encode image")
-        return "I'm sorry, I couldn't process the image at this time.", None
-
     payload = {
         "model": "gpt-4o-mini",
         "messages": [
@@ -145,8 +476,8 @@ def generate_image_description(image_path):
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}",
-                            "detail": "low",
+                            "url": image_data,
+                            "detail": detail,
                         },
                     },
                 ],
@@ -157,22 +488,79 @@ def generate_image_description(image_path):
     logger.info("Sending request to OpenAI API")
 
     try:
-        response = requests.post(OPENAI_API_URL, headers=OPENAI_HEADERS, json=payload)
-        response.raise_for_status()
-        description = response.json()["choices"][0]["message"]["content"]
+        with metrics.timed("openai"):
+            response = VISION_PROVIDERS.post(payload, deadline=deadline)
+            response.raise_for_status()
+            description = response.json()["choices"][0]["message"]["content"]
         logger.info(f"OpenAI: Generated description: {description[:100]}...")
-        return description, resized_filename
+        return description
     except requests.exceptions.RequestException as e:
         logger.error(f"OpenAI: Error in API request: {e}")
         if hasattr(e, "response") and e.response is not None:
             logger.error(f"OpenAI: Response status code: {e.response.status_code}")
             logger.error(f"OpenAI: Response content: {e.response.content}")
-        return "I'm sorry, I couldn't generate a description at this time.", None
+        return None
+
 
+def generate_description_and_instructions(image_data, deadline=None, detail="low"):
+    logger.info("OpenAI: Generating image description and instructions")
 
-def generate_instructions(image_description):
-    logger.info("Falcon: Generating concise instructions based on image description")
     payload = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "system",
+                "content": '''
+                You are an AI assistant providing critical safety information to a blind person.
+                Answer with a JSON object with two string fields:
+                "description": a concise description of the image, its main elements and their layout,
+                with special attention to obstacles, people and other dangers, and metric distances.
+                "instructions": critical safety information only. Mention ONLY obstacles or people
+                within 2 meters, prioritize potential dangers, use metric distances,
+                no directional instructions, 20-25 words maximum.
+                ''',
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_data,
+                            "detail": detail,
+                        },
+                    },
+                ],
+            },
+        ],
+        "response_format": {"type": "json_object"},
+    }
+
+    logger.info("Sending request to OpenAI API")
+
+    try:
+        with metrics.timed("openai"):
+            response = VISION_PROVIDERS.post(payload, deadline=deadline)
+            response.raise_for_status()
+            result = json.loads(response.json()["choices"][0]["message"]["content"])
+        description = result["description"]
+        instructions = result["instructions"]
+        logger.info(f"OpenAI: Generated description: {description[:100]}...")
+        logger.info(f"OpenAI: Generated instructions: {instructions}")
+        return description, instructions
+    except requests.exceptions.RequestException as e:
+        logger.error(f"OpenAI: Error in API request: {e}")
+        if hasattr(e, "response") and e.response is not None:
+            logger.error(f"OpenAI: Response status code: {e.response.status_code}")
+            logger.error(f"OpenAI: Response content: {e.response.content}")
+        return None, None
+    except (ValueError, KeyError) as e:
+        logger.error(f"OpenAI: Unexpected structured response: {e}")
+        return None, None
+
+
+def build_instructions_payload(image_description):
+    return {
         "model": "tiiuae/falcon-180B-chat",
         "messages": [
             {
@@ -201,27 +589,157 @@ def generate_instructions(image_description):
         "temperature": 0.5,
     }
 
+
+def build_delta_instructions_payload(changes, announced):
+    announced_hazards = " ".join(announced) or "nothing yet"
+    return {
+        "model": "tiiuae/falcon-180B-chat",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You warn a blind person about immediate dangers within 2 meters, "
+                "given only what changed since the previous frame. Extremely concise.",
+            },
+            {
+                "role": "user",
+                "content": f"Already announced: {announced_hazards}\n"
+                f"Changed: {' '.join(changes)}\n"
+                "Mention only new obstacles or people within 2 meters, or announced ones "
+                "now closer. Metric distances, 15 words maximum. "
+                f"If nothing new, answer exactly: {NOTHING_NEW}",
+            },
+        ],
+        "max_tokens": 30,
+        "temperature": 0.5,
+    }
+
+
+def delta_state(state):
+    # The scene state a frame's instructions are relative to, None when
+    # instructions are stateless
+    if INSTRUCTION_MODE == "delta" and PIPELINE_MODE == "two_hop":
+        return state
+    return None
+
+
+def delta_payload(image_description, state):
+    # Falcon request for what changed, None when nothing did
+    changes, announced = state.changes(image_description)
+    if not changes:
+        logger.info("Falcon: Scene unchanged, nothing new to say")
+        metrics.inc("visionaid_delta_frames_total", outcome="unchanged")
+        state.update(image_description, "")
+        return None
+    logger.info(f"Falcon: {len(changes)} new or changed sentences, {len(announced)} hazards announced")
+    return build_delta_instructions_payload(changes, announced)
+
+
+def delta_answer(image_description, state, instructions):
+    # "Nothing new" is not worth speaking
+    if instructions.strip().upper().startswith(NOTHING_NEW):
+        instructions = ""
+    metrics.inc("visionaid_delta_frames_total", outcome="new" if instructions else "nothing_new")
+    state.update(image_description, instructions)
+    return instructions
+
+
+def record_token_usage(body):
+    usage = body.get("usage") or {}
+    for kind in ("prompt", "completion"):
+        if f"{kind}_tokens" in usage:
+            metrics.observe("visionaid_instruction_tokens", usage[f"{kind}_tokens"], kind=kind)
+
+
+def generate_instructions(image_description, deadline=None, state=None):
+    # With a scene state, only what changed since the state's previous frame
+    if state is not None:
+        logger.info("Falcon: Generating instructions for what changed")
+        payload = delta_payload(image_description, state)
+        if payload is None:
+            return ""
+    else:
+        logger.info("Falcon: Generating concise instructions based on image description")
+        cached = instruction_cache.lookup(image_description)
+        if cached is not None:
+            return cached
+        payload = build_instructions_payload(image_description)
+
     try:
-        response = requests.post(FALCON_API_URL, headers=FALCON_HEADERS, json=payload)
-        response.raise_for_status()
-        instructions = response.json()["choices"][0]["message"]["content"]
+        with metrics.timed("falcon"):
+            response = INSTRUCTION_PROVIDERS.post(payload, deadline=deadline)
+            response.raise_for_status()
+            body = response.json()
+            instructions = body["choices"][0]["message"]["content"]
+        record_token_usage(body)
         logger.info(f"Falcon: Generated instructions: {instructions}")
+        if state is not None:
+            return delta_answer(image_description, state, instructions)
+        instruction_cache.store(image_description, instructions)
         return instructions
     except requests.exceptions.RequestException as e:
         logger.error(f"Falcon: Error in API request: {e}")
         if hasattr(e, "response") and e.response is not None:
             logger.error(f"Falcon: Response content: {e.response.content}")
-        return "Error analyzing surroundings. Please try again."
+        return INSTRUCTIONS_ERROR
 
 
-def speak_text(text):
-    try:
-        subprocess.run(["termux-tts-speak", text], check=True)
-        logger.info(f"Text spoken successfully: {text[:50]}...")
-        return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error speaking text: {e}")
+def stream_instructions(image_description, deadline=None, state=None):
+    if state is not None:
+        logger.info("Falcon: Streaming instructions for what changed")
+        payload = delta_payload(image_description, state)
+        if payload is None:
+            return
+    else:
+        logger.info("Falcon: Streaming instructions based on image description")
+        cached = instruction_cache.lookup(image_description)
+        if cached is not None:
+            yield cached
+            return
+        payload = build_instructions_payload(image_description)
+    payload["stream"] = True
+
+    start = time.monotonic()
+    # Streams go to the fastest provider, a hedge would speak twice
+    response = INSTRUCTION_PROVIDERS.primary().post(payload, stream=True, deadline=deadline)
+    response.raise_for_status()
+    instructions = ""
+    sent = 0
+    with response:
+        for content in streaming.iter_sse_content(response):
+            # Leaving the loop closes the response, which stops the generation
+            if deadline is not None:
+                deadline.check("Falcon")
+            if not instructions:
+                metrics.observe(
+                    "visionaid_stage_seconds",
+                    time.monotonic() - start,
+                    stage="falcon_first_token",
+                )
+            instructions += content
+            if state is not None and NOTHING_NEW.startswith(instructions.strip().upper()[:len(NOTHING_NEW)]):
+                # May be the "nothing new" answer, which must not be spoken
+                continue
+            yield instructions[sent:]
+            sent = len(instructions)
+    metrics.observe("visionaid_stage_seconds", time.monotonic() - start, stage="falcon")
+    if state is not None:
+        delta_answer(image_description, state, instructions)
+    elif instructions:
+        instruction_cache.store(image_description, instructions)
+
+
+def speak_text(text, deadline=None, session_id=None):
+    # Only queues the text, the speech worker speaks it in the background.
+    # A newer frame only supersedes speech of its own session.
+    if not text:
         return False
+    return speech_worker.say(text, deadline=deadline, session=session_id)
+
+
+def no_fresh_data(error):
+    logger.warning(f"No fresh data: {error}")
+    metrics.inc("visionaid_no_fresh_data_total", reason=str(error).split(": ")[-1])
+    return {"no_fresh_data": True, "reason": str(error)}
 
 
 @app.route("/")
@@ -229,54 +747,713 @@ def index():
     return render_template("index.html")
 
 
+def new_frame(session, continuous=False):
+    # Per-session frame id, deadline and scene state. The deadline starts
+    # now, so time spent waiting for a worker counts against it. Only a
+    # continuous capture's frames are relative to the previous frame, a
+    # user asking again must hear the full answer again.
+    return {
+        "id": f"{session.id}-{session.next_frame()}",
+        "session_id": session.id,
+        "deadline": deadlines.Deadline(session.deadlines.budget),
+        "scene_state": delta_state(session.scene) if continuous else None,
+    }
+
+
+def submit_frame(session, frame, fn, *args):
+    # Raises workers.Rejected when the pool is full. Only an accepted frame
+    # supersedes the session's frame in flight.
+    future = inference_pool.submit(session.id, fn, frame, *args)
+    session.deadlines.supersede(frame["deadline"])
+    return future
+
+
+def capture_and_describe(frame, image_bytes=None):
+    # Without image_bytes the frame comes from the camera
+    logger.info(f"Frame {frame['id']}: Processing")
+    deadline = frame["deadline"]
+    if image_bytes is None:
+        image_bytes, error = take_usable_photo()
+    else:
+        reason = quality_gate.check(image_bytes) if QUALITY_GATE else None
+        error = quality.REJECTION_MESSAGES[reason] if reason else None
+    if error:
+        logger.error(error)
+        return None, error
+
+    file_size_mb = check_image_size(image_bytes)
+    image_format = check_image_format(image_bytes)
+
+    logger.info(f"Original image size: {file_size_mb:.2f} MB")
+    logger.info(f"Original image format: {image_format}")
+
+    image_data, resized_filename, fingerprint, encoding = resize_and_encode_bytes(image_bytes)
+    if image_data is None:
+        logger.error("Failed to resize and encode image")
+        return None, "Failed to resize and encode image"
+
+    # Check size of resized image
+    resized_size_mb = check_image_size(image_data.image_bytes)
+    logger.info(f"Resized image size: {resized_size_mb:.2f} MB")
+
+    scene, error = describe_scene(
+        image_data,
+        resized_filename,
+        fingerprint,
+        deadline,
+        encoding,
+        frame["scene_state"],
+        frame["session_id"],
+    )
+    if scene is not None:
+        scene["deadline"] = deadline
+        scene["frame_id"] = frame["id"]
+        scene["scene_state"] = frame["scene_state"]
+    return scene, error
+
+
+def describe_scene(
+    image_data,
+    resized_filename,
+    fingerprint,
+    deadline=None,
+    encoding=None,
+    scene_state=None,
+    session_id=None,
+):
+    scene = {"resized_filename": resized_filename, "fingerprint": fingerprint, "session_id": session_id}
+
+    # Same scene as a recent frame of the same session: reuse its result, no
+    # network calls
+    cached = scene_cache.lookup(fingerprint, session_id)
+    if cached is not None:
+        scene.update(cached, cached=True)
+        if scene_state is not None:
+            # Full instructions cached by a capture are not what changed
+            scene["instructions"] = None
+        return scene, None
+
+    detail = encoding["detail"] if encoding else "low"
+    started = time.monotonic()
+    if PIPELINE_MODE == "single_hop":
+        description, instructions = generate_description_and_instructions(
+            image_data, deadline, detail
+        )
+    else:
+        description = generate_image_description(image_data, deadline, detail)
+        instructions = None
+    if encoding:
+        # Vision latency per frame size, to see what smaller frames buy
+        metrics.observe(
+            "visionaid_vision_seconds", time.monotonic() - started, size=encoding["target_size"]
+        )
+    if description is None:
+        logger.error("Failed to generate image description")
+        return None, "Failed to generate image description"
+    scene.update(description=description, instructions=instructions, cached=False)
+    return scene, None
+
+
+def remember_scene(scene):
+    if scene["cached"] or scene["instructions"] == INSTRUCTIONS_ERROR:
+        return
+    # Delta instructions only make sense to the session they were made for
+    instructions = scene["instructions"] if scene.get("scene_state") is None else None
+    scene_cache.store(
+        scene["fingerprint"],
+        {"description": scene["description"], "instructions": instructions},
+        scene["session_id"],
+    )
+
+
+def process_frame(frame, image_bytes=None, speak=True):
+    try:
+        scene, error = capture_and_describe(frame, image_bytes)
+        if error:
+            return {"error": error, "frame_id": frame["id"]}
+
+        image_description = scene["description"]
+        if scene["instructions"] is None:
+            scene["instructions"] = generate_instructions(
+                image_description, scene["deadline"], scene["scene_state"]
+            )
+    except deadlines.DeadlineExceeded as e:
+        return dict(no_fresh_data(e), frame_id=frame["id"])
+    remember_scene(scene)
+    instructions = scene["instructions"]
+    logger.info(f"Full image description: {image_description}")
+    logger.info(f"Full instructions: {instructions}")
+
+    # Queue the Falcon instructions for speaking
+    instructions_spoken = (
+        speak_text(instructions, scene["deadline"], frame["session_id"]) if speak else False
+    )
+
+    logger.info(f"Frame {frame['id']}: Processing completed successfully")
+    return {
+        "frame_id": frame["id"],
+        "description": image_description,
+        "instructions": instructions,
+        "resized_image_url": f"/uploads/{scene['resized_filename']}",
+        "instructions_spoken": instructions_spoken,
+        "cached": scene["cached"],
+    }
+
+
+def collect_views(frame, uploads=None):
+    # Distinct views of a burst: the uploaded frames, or the camera's frames
+    # for AROUND_DURATION seconds. Each frame is resized and fingerprinted
+    # as it arrives, while the user is still turning, so only the vision
+    # call is left once the burst is over.
+    selector = multiview.ViewSelector(AROUND_MIN_DISTANCE, AROUND_MAX_VIEWS)
+    views = []
+
+    def offer(image_bytes):
+        if QUALITY_GATE and quality_gate.check(image_bytes):
+            return
+        try:
+            resized_bytes = imaging.resize_image(image_bytes, AROUND_VIEW_SIZE)
+        except Exception as e:
+            logger.error(f"Around: Error resizing frame: {e}")
+            return
+        fingerprint = imaging.difference_hash(resized_bytes) if imaging.pillow_available() else None
+        if selector.offer(fingerprint):
+            views.append(resized_bytes)
+
+    with metrics.timed("around_burst"):
+        if uploads is not None:
+            for image_bytes in uploads:
+                if selector.full:
+                    break
+                offer(image_bytes)
+        else:
+            ends_at = time.monotonic() + AROUND_DURATION
+            seq = 0
+            while time.monotonic() < ends_at and not selector.full:
+                frame["deadline"].check("Around")
+                image_bytes, seq = take_photo(seq)
+                if not image_bytes:
+                    break
+                offer(image_bytes)
+    logger.info(f"Around: {len(views)} distinct views")
+    return views
+
+
+def build_around_payload(views):
+    if AROUND_LAYOUT == "mosaic" and imaging.pillow_available():
+        columns = min(AROUND_COLUMNS, len(views))
+        tile = 512 // max(columns, (len(views) + columns - 1) // columns)
+        with metrics.timed("mosaic"):
+            images = [imaging.tile_images(views, columns, f"{tile}x{tile}")]
+        layout = (
+            f"This image tiles {len(views)} photos, left to right then top to bottom, "
+            "taken in order while a blind person turned around in place"
+        )
+    else:
+        images = views
+        layout = f"These {len(views)} photos were taken in order while a blind person turned around in place"
+    content = [
+        {
+            "type": "text",
+            "text": f"{layout}; the first one is straight ahead. "
+            "Describe their surroundings concisely: what is in each direction, "
+            "with special attention to obstacles, people and other dangers, "
+            "and distances in meters. Something seen in two neighbouring photos "
+            "is one object, mention it once.",
+        }
+    ]
+    for image_bytes in images:
+        content.append(
+            {
+                "type": "image_url",
+                "image_url": {"url": payloads.ImageData(image_bytes), "detail": "low"},
+            }
+        )
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}]}
+
+
+def generate_around_description(views, deadline=None):
+    logger.info(f"OpenAI: Describing the surroundings from {len(views)} views")
+    payload = build_around_payload(views)
+    try:
+        with metrics.timed("openai"):
+            response = VISION_PROVIDERS.post(payload, deadline=deadline)
+            response.raise_for_status()
+            description = response.json()["choices"][0]["message"]["content"]
+        logger.info(f"OpenAI: Generated description: {description[:100]}...")
+        return description
+    except requests.exceptions.RequestException as e:
+        logger.error(f"OpenAI: Error in API request: {e}")
+        if hasattr(e, "response") and e.response is not None:
+            logger.error(f"OpenAI: Response status code: {e.response.status_code}")
+            logger.error(f"OpenAI: Response content: {e.response.content}")
+        return None
+
+
+def process_around(frame, uploads=None, speak=True):
+    # "What's around me": one description and one set of instructions for
+    # all the views of a burst
+    try:
+        views = collect_views(frame, uploads)
+        if not views:
+            return {"error": "No usable frame, hold the phone up and turn slowly", "frame_id": frame["id"]}
+        metrics.observe("visionaid_around_views", len(views))
+        with metrics.timed("store"):
+            filenames = [frame_store.put(view) for view in views]
+        description = generate_around_description(views, frame["deadline"])
+        if description is None:
+            return {"error": "Failed to generate image description", "frame_id": frame["id"]}
+        instructions = generate_instructions(description, frame["deadline"])
+    except deadlines.DeadlineExceeded as e:
+        return dict(no_fresh_data(e), frame_id=frame["id"])
+    logger.info(f"Full surroundings description: {description}")
+    logger.info(f"Full instructions: {instructions}")
+
+    instructions_spoken = (
+        speak_text(instructions, frame["deadline"], frame["session_id"]) if speak else False
+    )
+
+    logger.info(f"Frame {frame['id']}: Around me completed successfully")
+    return {
+        "frame_id": frame["id"],
+        "description": description,
+        "instructions": instructions,
+        "views": len(views),
+        "resized_image_urls": [f"/uploads/{filename}" for filename in filenames],
+        "instructions_spoken": instructions_spoken,
+    }
+
+
+def client_session(default):
+    return client_sessions.get(request.headers.get("X-Client-Id") or default)
+
+
+def server_busy(error):
+    logger.warning(f"Inference pool full, request refused: {error}")
+    return jsonify({"error": "Server busy, please try again."}), 503, {"Retry-After": "1"}
+
+
+def run_frame(session, image_bytes=None, speak=True, job=process_frame, continuous=False):
+    frame = new_frame(session, continuous)
+    try:
+        future = submit_frame(session, frame, job, image_bytes, speak)
+    except workers.Rejected as e:
+        return server_busy(e)
+    try:
+        return jsonify(future.result())
+    except workers.Superseded as e:
+        return jsonify(dict(no_fresh_data(e), frame_id=frame["id"]))
+
+
 @app.route("/process_image", methods=["POST"])
 def process_image():
     logger.info("Starting image processing")
-    image_path = take_photo(camera_id=0)  # Use back camera (camera_id=0)
-    if image_path and os.path.exists(image_path):
-        file_size_mb = check_file_size(image_path)
-        image_format = check_image_format(image_path)
+    return run_frame(client_session(CAMERA_SESSION))
+
+
+def read_uploaded_frame():
+    # Raw JPEG body, or the "frame" (else the first) file of a multipart form
+    if request.files:
+        upload = request.files.get("frame") or next(iter(request.files.values()))
+        return upload.read()
+    return request.get_data()
+
 
-        logger.info(f"Original image size: {file_size_mb:.2f} MB")
-        logger.info(f"Original image format: {image_format}")
+def is_image(image_bytes):
+    # The magic bytes pass for a truncated JPEG, which must not reach the
+    # quality gate or the resize
+    return check_image_format(image_bytes) is not None and imaging.decodable(image_bytes)
 
-        image_description, resized_filename = generate_image_description(image_path)
-        if resized_filename is None:
-            logger.error("Failed to resize and encode image")
-            return jsonify({"error": "Failed to resize and encode image"})
 
-        resized_path = os.path.join(app.config["UPLOAD_FOLDER"], resized_filename)
+@app.route("/frames", methods=["POST"])
+def upload_frame():
+    # A frame sent by a phone or a browser instead of taken by the local
+    # camera. The client speaks the answer itself unless it asks for ?speak=1
+    # (the server's speaker is not where the client is), ?continuous=1 marks
+    # frames sent in a loop (delta instructions).
+    image_bytes = read_uploaded_frame()
+    if not image_bytes:
+        return jsonify({"error": "No frame in request"}), 400
+    if not is_image(image_bytes):
+        return jsonify({"error": "Frame is not an image"}), 400
+    session = client_session(request.remote_addr)
+    logger.info(f"Frame uploaded by {session.id} ({len(image_bytes)} bytes)")
+    return run_frame(
+        session,
+        image_bytes,
+        speak=request.args.get("speak", "0") == "1",
+        continuous=request.args.get("continuous") == "1",
+    )
 
-        # Check size of resized image
-        resized_size_mb = check_file_size(resized_path)
-        logger.info(f"Resized image size: {resized_size_mb:.2f} MB")
 
-        instructions = generate_instructions(image_description)
+@app.route("/around", methods=["POST"])
+def around():
+    # One description of the surroundings from a burst taken while the user
+    # turns around: several "frame" files of a multipart form, in capture
+    # order, or else the server camera's frames. Uploaded bursts are spoken
+    # only with ?speak=1, as for /frames; the camera's with ?speak=0 aren't.
+    uploads = None
+    if request.files:
+        uploads = [upload.read() for upload in request.files.getlist("frame") or request.files.values()]
+        if not all(is_image(image_bytes) for image_bytes in uploads):
+            return jsonify({"error": "Frame is not an image"}), 400
+    session = client_session(request.remote_addr if uploads else CAMERA_SESSION)
+    logger.info(f"Around me for {session.id} ({len(uploads) if uploads else 'camera'} frames)")
+    speak = request.args.get("speak", "0" if uploads else "1") == "1"
+    return run_frame(session, uploads, speak=speak, job=process_around)
+
+
+@app.route("/process_image_stream", methods=["POST"])
+def process_image_stream():
+    # Same pipeline as /process_image, but the Falcon answer is pushed to the
+    # client as newline-delimited JSON events while it is generated, and each
+    # clause is spoken as soon as it is complete
+    def event(**data):
+        return json.dumps(data) + "\n"
+
+    # Capture and description run on the inference pool, only the Falcon
+    # stream is relayed from the request thread
+    session = client_session(CAMERA_SESSION)
+    frame = new_frame(session)
+    try:
+        future = submit_frame(session, frame, capture_and_describe)
+    except workers.Rejected as e:
+        return server_busy(e)
+
+    def generate():
+        logger.info("Starting streamed image processing")
+        try:
+            scene, error = future.result()
+        except (deadlines.DeadlineExceeded, workers.Superseded) as e:
+            yield event(type="no_fresh_data", **no_fresh_data(e))
+            return
+        if error:
+            yield event(type="error", error=error)
+            return
+
+        image_description = scene["description"]
+        yield event(
+            type="description",
+            frame_id=frame["id"],
+            description=image_description,
+            resized_image_url=f"/uploads/{scene['resized_filename']}",
+            cached=scene["cached"],
+        )
+
+        # True once at least one clause was queued for speaking
+        instructions_spoken = False
+        if scene["instructions"] is not None:
+            clauses = streaming.iter_clauses([scene["instructions"]])
+        else:
+            clauses = streaming.iter_clauses(
+                stream_instructions(image_description, scene["deadline"], scene["scene_state"])
+            )
+        instructions = ""
+        complete = True
+        try:
+            for clause in clauses:
+                if not instructions:
+                    logger.info(f"Falcon: First clause ready: {clause}")
+                if speak_text(clause, scene["deadline"], scene["session_id"]):
+                    instructions_spoken = True
+                instructions = f"{instructions} {clause}".strip()
+                yield event(type="instructions", text=clause)
+        except deadlines.DeadlineExceeded as e:
+            # Keep what was already said, the rest would come too late
+            if not instructions:
+                yield event(type="no_fresh_data", **no_fresh_data(e))
+                return
+            logger.warning(f"Falcon: Stream cut short: {e}")
+            complete = False
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if scene["deadline"].expired:
+                yield event(
+                    type="no_fresh_data",
+                    **no_fresh_data(f"Falcon: {scene['deadline'].reason}"),
+                )
+                return
+            logger.error(f"Falcon: Error in streaming API request: {e}")
+            if not instructions:
+                instructions = INSTRUCTIONS_ERROR
+                instructions_spoken = speak_text(instructions, scene["deadline"], scene["session_id"])
+                yield event(type="instructions", text=instructions)
+
         logger.info(f"Full image description: {image_description}")
         logger.info(f"Full instructions: {instructions}")
+        scene["instructions"] = instructions
+        if complete:
+            remember_scene(scene)
 
-        # Speak the Falcon instructions and get the result
-        instructions_spoken = speak_text(instructions)
+        logger.info("Streamed image processing completed successfully")
+        yield event(
+            type="done",
+            instructions=instructions,
+            instructions_spoken=instructions_spoken,
+        )
 
-        logger.info("Image processing completed successfully")
-        return jsonify(
-            {
-                "description": image_description,
-                "instructions": instructions,
-                "resized_image_url": f"/uploads/{resized_filename}?t={datetime.now().timestamp()}",
-                "instructions_spoken": instructions_spoken,
-            }
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def live_resize(frame):
+    # Live mode doesn't retry a rejected frame, the next one is on its way
+    if QUALITY_GATE and quality_gate.check(frame["image_bytes"]):
+        return None
+    image_data, resized_filename, fingerprint, encoding = resize_and_encode_bytes(
+        frame.pop("image_bytes")
+    )
+    if image_data is None:
+        return None
+    frame["deadline"] = deadlines.Deadline(FRAME_DEADLINE, frame["captured_at"], live_session)
+    frame["scene_state"] = delta_state(live_scene)
+    # Live frames come from the server's own camera
+    frame["session_id"] = sessions.session_id(CAMERA_SESSION)
+    frame["image_data"] = image_data
+    frame["resized_filename"] = resized_filename
+    frame["fingerprint"] = fingerprint
+    frame["encoding"] = encoding
+    return frame
+
+
+def live_no_fresh_data(frame, error):
+    result = no_fresh_data(error)
+    socketio.emit("no_fresh_data", dict(result, frame_id=frame["id"]), to=LIVE_ROOM)
+
+
+def live_describe(frame):
+    try:
+        scene, error = describe_scene(
+            frame.pop("image_data"),
+            frame["resized_filename"],
+            frame["fingerprint"],
+            frame["deadline"],
+            frame["encoding"],
+            frame["scene_state"],
+            frame["session_id"],
         )
-    else:
-        logger.error("Failed to take photo or photo file not found")
-        return jsonify({"error": "Failed to take photo or photo file not found"})
+    except deadlines.DeadlineExceeded as e:
+        live_no_fresh_data(frame, e)
+        return None
+    if error:
+        return None
+    frame.update(scene)
+    return frame
+
+
+def live_instruct(frame):
+    if frame["instructions"] is None:
+        try:
+            frame["instructions"] = generate_instructions(
+                frame["description"], frame["deadline"], frame["scene_state"]
+            )
+        except deadlines.DeadlineExceeded as e:
+            live_no_fresh_data(frame, e)
+            return None
+    remember_scene(frame)
+    return frame
+
+
+def live_speak(frame):
+    frame["instructions_spoken"] = speak_text(
+        frame["instructions"], frame["deadline"], frame["session_id"]
+    )
+    return frame
+
+
+LIVE_STAGES = [
+    ("resize", live_resize),
+    ("describe", live_describe),
+    ("instruct", live_instruct),
+    ("speak", live_speak),
+]
+
+
+def live_result(frame):
+    return {
+        "frame_id": frame["id"],
+        "description": frame.get("description"),
+        "instructions": frame.get("instructions"),
+        "resized_image_url": f"/uploads/{frame['resized_filename']}",
+        "instructions_spoken": frame.get("instructions_spoken"),
+        "latency": frame.get("latency"),
+        "cached": frame.get("cached"),
+    }
+
+
+def publish_live_event(stage, frame):
+    # Push each piece of a live result to the clients as soon as it is ready
+    result = live_result(frame)
+    if stage == "resize":
+        socketio.emit(
+            "frame",
+            {"frame_id": frame["id"], "resized_image_url": result["resized_image_url"]},
+            to=LIVE_ROOM,
+        )
+    elif stage == "describe":
+        socketio.emit(
+            "description",
+            {"frame_id": frame["id"], "description": result["description"]},
+            to=LIVE_ROOM,
+        )
+    elif stage == "instruct":
+        socketio.emit("instructions", result, to=LIVE_ROOM)
+    elif stage == "speak":
+        metrics.observe(
+            "visionaid_stage_seconds",
+            time.monotonic() - frame["captured_at"],
+            stage="live_frame",
+        )
+        socketio.emit("spoken", result, to=LIVE_ROOM)
+
+
+def start_live_pipeline():
+    global live_pipeline, live_session
+    with live_lock:
+        if live_pipeline is None or not live_pipeline.running:
+            # Parent of every frame deadline, cancelled when live mode stops
+            live_session = deadlines.Deadline()
+            live_scene.reset()
+            # Only hand each buffered frame to the pipeline once
+            current_camera = get_camera()
+            if capture_daemon is not None:
+                capture = capture_daemon.reader(timeout=CAPTURE_TIMEOUT)
+            else:
+                capture = current_camera.capture
+            live_pipeline = pipeline.LivePipeline(
+                capture,
+                LIVE_STAGES,
+                on_event=publish_live_event,
+                capture_interval=LIVE_CAPTURE_INTERVAL,
+            )
+            live_pipeline.start()
+
+
+def stop_live_pipeline():
+    with live_lock:
+        if live_pipeline is not None and live_pipeline.running:
+            # Don't wait for a stage stuck in an upstream call, cancelling
+            # the session aborts it and it won't publish anything anymore
+            live_session.cancel()
+            live_pipeline.stop(timeout=0)
+
+
+@app.route("/live/start", methods=["POST"])
+def live_start():
+    start_live_pipeline()
+    return jsonify({"running": True})
+
+
+@app.route("/live/stop", methods=["POST"])
+def live_stop():
+    stop_live_pipeline()
+    return jsonify({"running": False})
+
+
+@app.route("/live/latest")
+def live_latest():
+    if live_pipeline is None:
+        return jsonify({"running": False, "result": None})
+    frame = live_pipeline.latest_result
+    return jsonify(
+        {
+            "running": live_pipeline.running,
+            "result": live_result(frame) if frame else None,
+            "stats": live_pipeline.stats,
+        }
+    )
+
+
+def leave_live_session(sid):
+    leave_room(LIVE_ROOM, sid=sid)
+    live_clients.discard(sid)
+    if not live_clients:
+        stop_live_pipeline()
+
+
+@socketio.on("live_start")
+def on_live_start():
+    join_room(LIVE_ROOM)
+    live_clients.add(request.sid)
+    logger.info(f"Live session started by {request.sid}")
+    start_live_pipeline()
+    emit("live_status", {"running": True})
+
+
+@socketio.on("live_stop")
+def on_live_stop():
+    logger.info(f"Live session stopped by {request.sid}")
+    leave_live_session(request.sid)
+    emit("live_status", {"running": False})
+
+
+@socketio.on("disconnect")
+def on_disconnect():
+    if request.sid in live_clients:
+        leave_live_session(request.sid)
+
+
+@app.route("/camera/frame", methods=["POST"])
+def camera_frame():
+    # Feed the "upload" camera backend, e.g. from a browser camera
+    current_camera = get_camera()
+    if not isinstance(current_camera, UploadCamera):
+        return jsonify({"error": f"Camera backend is {CAMERA_BACKEND}, not upload"}), 400
+    image_bytes = request.get_data()
+    if not image_bytes:
+        return jsonify({"error": "Empty frame"}), 400
+    current_camera.push(image_bytes)
+    return jsonify({"received": len(image_bytes)})
+
+
+@app.before_request
+def count_request():
+    metrics.inc("visionaid_http_requests_total", endpoint=request.endpoint or "unknown")
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/cache_stats")
+def cache_stats():
+    return jsonify(
+        {"scene": scene_cache.stats(), "instructions": instruction_cache.stats()}
+    )
+
+
+@app.route("/quality_stats")
+def quality_stats():
+    return jsonify(quality_gate.stats())
+
+
+@app.route("/provider_stats")
+def provider_stats():
+    return jsonify(
+        {"vision": VISION_PROVIDERS.stats(), "instructions": INSTRUCTION_PROVIDERS.stats()}
+    )
 
 
 @app.route("/uploads/<filename>")
 def uploaded_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    # A name is the hash of the frame's bytes, so the response never changes:
+    # strong ETag and cached for a year without revalidation
+    image_bytes = frame_store.get(filename) if FrameStore.valid_name(filename) else None
+    if image_bytes is None:
+        abort(404)
+    response = Response(image_bytes, mimetype="image/jpeg")
+    response.set_etag(filename.rsplit(".", 1)[0])
+    response.cache_control.public = True
+    response.cache_control.max_age = 365 * 24 * 3600
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
 
 
 if __name__ == "__main__":
     logger.info("Starting Falcon Vision Aid application")
-    app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    http_clients.prewarm(
+        [provider.client for pool in (VISION_PROVIDERS, INSTRUCTION_PROVIDERS) for provider in pool.providers]
+    )
+    # eventlet's WSGI server (the default) serves many concurrent clients;
+    # in threading mode this is the Werkzeug development server
+    options = {"max_size": SERVER_MAX_CONNECTIONS} if SOCKETIO_ASYNC_MODE == "eventlet" else {}
+    socketio.run(app, host=HOST, port=PORT, debug=DEBUG, use_reloader=DEBUG, **options)
\ No newline at end of file
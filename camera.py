@@ -0,0 +1,224 @@
+import itertools
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+
+import imaging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm", ".avi", ".3gp")
+
+
+class Frame:
+    def __init__(self, seq, data, captured_at=None):
+        self.seq = seq
+        self.data = data
+        self.captured_at = captured_at if captured_at is not None else time.monotonic()
+
+
+class TermuxCamera:
+    # One photo per capture through the Termux:API camera
+
+    retry_delay = 1.0
+
+    def __init__(
+        self,
+        camera_id=0,
+        filename="visionAId.jpg",
+        filepath="~/storage/dcim/",
+        resolution="800x600",
+    ):
+        self.camera_id = camera_id
+        self.path = os.path.expanduser(os.path.join(filepath, filename))
+        self.resolution = resolution
+
+    def capture(self):
+        logger.info(f"Taking photo with camera ID {self.camera_id}")
+        with metrics.timed("camera_capture"):
+            try:
+                subprocess.run(
+                    ["termux-camera-photo", "-c", str(self.camera_id), self.path],
+                    check=True,
+                )
+                with open(self.path, "rb") as image_file:
+                    data = image_file.read()
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.error(f"Error taking photo: {e}")
+                return None
+        # termux-camera-photo has no size option, downscale here instead
+        # (long side to the long side of the resolution, either orientation)
+        if self.resolution and imaging.pillow_available():
+            data = imaging.downscale(data, self.resolution)
+        return data
+
+
+class ReplayCamera:
+    # Replays a directory of images (in name order) or a video file, for tests
+    # and benchmarks. `interval` paces the frames like a real camera would.
+
+    retry_delay = 1.0
+
+    def __init__(self, source, interval=0.0, loop=True, fps=2):
+        self.source = source
+        self.interval = interval
+        self.loop = loop
+        self.frames = self._load(source, fps)
+        self.index = 0
+        self.last_capture = None
+        self.lock = threading.Lock()
+        logger.info(f"Replay camera: {len(self.frames)} frames from {source}")
+
+    def _load(self, source, fps):
+        if os.path.isdir(source):
+            frames = []
+            for name in sorted(os.listdir(source)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    with open(os.path.join(source, name), "rb") as image_file:
+                        frames.append(image_file.read())
+            return frames
+        if source.lower().endswith(VIDEO_EXTENSIONS):
+            return self._load_video(source, fps)
+        with open(source, "rb") as image_file:
+            return [image_file.read()]
+
+    def _load_video(self, source, fps):
+        if not shutil.which("ffmpeg"):
+            raise RuntimeError("ffmpeg is required to replay video files")
+        result = subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-i", source, "-vf", f"fps={fps}",
+             "-f", "image2pipe", "-c:v", "mjpeg", "-"],
+            capture_output=True,
+            check=True,
+        )
+        # ffmpeg writes the JPEGs back to back, split them on the EOI marker
+        return [chunk + b"\xff\xd9" for chunk in result.stdout.split(b"\xff\xd9") if chunk]
+
+    def capture(self):
+        with self.lock:
+            if self.index >= len(self.frames):
+                if not self.loop or not self.frames:
+                    return None
+                self.index = 0
+            if self.interval and self.last_capture is not None:
+                remaining = self.interval - (time.monotonic() - self.last_capture)
+                if remaining > 0:
+                    time.sleep(remaining)
+            self.last_capture = time.monotonic()
+            data = self.frames[self.index]
+            self.index += 1
+            return data
+
+
+class UploadCamera:
+    # Frames pushed by a client (e.g. a browser camera) instead of captured
+    # locally; capture() waits for the next pushed frame
+
+    retry_delay = 0.0
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self.frame = None
+        self.condition = threading.Condition()
+
+    def push(self, data):
+        with self.condition:
+            self.frame = data
+            self.condition.notify_all()
+
+    def capture(self):
+        with self.condition:
+            if self.frame is None:
+                self.condition.wait(self.timeout)
+            data, self.frame = self.frame, None
+            return data
+
+
+class CaptureDaemon:
+    # Keeps capturing in the background and holds the last `size` frames in
+    # memory, so a request gets the newest frame right away instead of
+    # waiting for a cold camera invocation
+
+    def __init__(self, camera, size=4, interval=0.0):
+        self.camera = camera
+        self.interval = interval
+        self.buffer = deque(maxlen=size)
+        self.seq = itertools.count(1)
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="capture-daemon", daemon=True)
+        self.thread.start()
+        logger.info(f"Capture daemon started ({type(self.camera).__name__})")
+        return self
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                data = self.camera.capture()
+            except Exception as e:
+                logger.error(f"Capture daemon: Error capturing frame: {e}")
+                data = None
+            if data:
+                with self.condition:
+                    self.buffer.append(Frame(next(self.seq), data))
+                    self.condition.notify_all()
+            else:
+                # Don't hammer a failing camera
+                self.stop_event.wait(self.camera.retry_delay)
+            remaining = self.interval - (time.monotonic() - started)
+            if remaining > 0:
+                self.stop_event.wait(remaining)
+
+    def latest(self, newer_than=0, timeout=None):
+        # Newest buffered frame with a sequence number above `newer_than`,
+        # waiting up to `timeout` seconds for one to arrive
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.buffer and self.buffer[-1].seq > newer_than, timeout
+            )
+            if self.buffer and self.buffer[-1].seq > newer_than:
+                return self.buffer[-1]
+            return None
+
+    def reader(self, timeout=None):
+        # capture()-style callable that only ever returns frames it hasn't
+        # returned before, for consumers that must not see a frame twice
+        last_seq = 0
+
+        def capture():
+            nonlocal last_seq
+            frame = self.latest(newer_than=last_seq, timeout=timeout)
+            if frame is None:
+                return None
+            last_seq = frame.seq
+            return frame.data
+
+        return capture
+
+
+def create_camera(backend, source=None, camera_id=0, interval=0.0):
+    if backend == "termux":
+        return TermuxCamera(camera_id=camera_id)
+    if backend == "replay":
+        if not source:
+            raise ValueError("The replay camera needs a source directory or video")
+        return ReplayCamera(source, interval=interval)
+    if backend == "upload":
+        return UploadCamera()
+    raise ValueError(f"Unknown camera backend: {backend}")
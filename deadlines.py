@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    # Latency budget of one capture: expires `budget` seconds after the frame
+    # was captured, or earlier when it is cancelled because a newer frame
+    # superseded it (or its parent, e.g. a live session, was cancelled).
+    # No budget means it only ends when cancelled.
+
+    def __init__(self, budget=None, started_at=None, parent=None):
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.expires_at = self.started_at + budget if budget else None
+        self.parent = parent
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set() or (
+            self.parent is not None and self.parent.cancelled
+        )
+
+    def remaining(self):
+        remaining = None
+        if self.expires_at is not None:
+            remaining = max(0.0, self.expires_at - time.monotonic())
+        if self.parent is not None and self.parent.remaining() is not None:
+            parent_remaining = self.parent.remaining()
+            remaining = parent_remaining if remaining is None else min(remaining, parent_remaining)
+        return remaining
+
+    @property
+    def expired(self):
+        return self.cancelled or self.remaining() == 0
+
+    @property
+    def reason(self):
+        if self.cancelled:
+            return "superseded"
+        if self.remaining() == 0:
+            return "deadline exceeded"
+        return None
+
+    def check(self, what):
+        if self.expired:
+            raise DeadlineExceeded(f"{what}: {self.reason}")
+
+    def clip(self, timeout):
+        # (connect, read) timeout no longer than what is left of the budget
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return tuple(min(value, remaining) for value in timeout)
+
+
+class Latest:
+    # Hands out one deadline per capture and cancels the previous one: once
+    # a newer frame is on its way, nobody will listen to the older answer
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.current = None
+        self.lock = threading.Lock()
+
+    def start(self, started_at=None, parent=None):
+        return self.supersede(Deadline(self.budget, started_at, parent))
+
+    def supersede(self, deadline):
+        with self.lock:
+            if self.current is not None:
+                self.current.cancel()
+            self.current = deadline
+            return deadline
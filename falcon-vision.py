@@ -4,12 +4,20 @@ import json
 import base64
 import logging
 import subprocess
+import sys
+import threading
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from dotenv import load_dotenv
 import imghdr
 from flask import Flask, render_template, jsonify, request, send_from_directory
 from flask_cors import CORS
 
+import http_clients
+import imaging
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -25,8 +33,15 @@ if not AI71_API_KEY or not OPENAI_API_KEY:
     raise ValueError("API keys not found in .env file")
 
 # API setups
-OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
-FALCON_API_URL = "https://api.ai71.ai/v1/chat/completions"
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+FALCON_API_URL = os.getenv("FALCON_API_URL", "https://api.ai71.ai/v1/chat/completions")
+
+# Models, overridable to evaluate a change on recorded frames (see replay)
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+FALCON_MODEL = os.getenv("FALCON_MODEL", "tiiuae/falcon-180B-chat")
+
+# (connect, read) timeouts of the API calls, in seconds
+API_TIMEOUT = (3.05, 30)
 
 OPENAI_HEADERS = {
     "Content-Type": "application/json",
@@ -42,6 +57,9 @@ app = Flask(__name__)
 CORS(app)
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 
+# Keep-alive connections shared by all requests (and replay workers)
+http_session = http_clients.create_session(pool_size=16)
+
 def take_photo(camera_id=0, filename='visionAId.jpg', filepath='~/storage/dcim/', resolution='800x600'):
     _path = os.path.join(filepath, filename)
     _path = os.path.expanduser(_path)  # Expand the ~ in the filepath
@@ -78,13 +96,14 @@ def resize_and_encode_image(image_path, target_size="512x512"):
         # Ensure the upload folder exists
         os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         
-        # Resize image using ImageMagick's magick convert command
-        subprocess.run(['magick', 'convert', image_path, '-resize', target_size+'^', '-gravity', 'center', '-extent', target_size, resized_path], check=True)
+        # Resize in memory (Pillow, ImageMagick as fallback)
+        with open(image_path, "rb") as image_file:
+            resized_bytes = imaging.resize_image(image_file.read(), target_size)
+        with open(resized_path, "wb") as image_file:
+            image_file.write(resized_bytes)
         logger.info(f"Image resized and saved to {resized_path}")
         
-        # Read and encode the resized image
-        with open(resized_path, "rb") as image_file:
-            encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
+        encoded_image = base64.b64encode(resized_bytes).decode('utf-8')
         logger.info("Image encoded successfully")
         return encoded_image, resized_filename
     except subprocess.CalledProcessError as e:
@@ -94,16 +113,23 @@ def resize_and_encode_image(image_path, target_size="512x512"):
         logger.error(f"Error encoding image: {e}")
         return None, None
 
-def generate_image_description(image_path):
-    logger.info("OpenAI: Generating image description")
-    
-    base64_image, resized_filename = resize_and_encode_image(image_path)
-    if not base64_image:
-        logger.error("Failed to resize and encode image")
-        return "I'm sorry, I couldn't process the image at this time.", None
-    
+def encode_image(image_path, target_size="512x512"):
+    # Resized and base64-encoded in memory only, replay keeps no previews
+    try:
+        with open(image_path, "rb") as image_file:
+            resized_bytes = imaging.resize_image(image_file.read(), target_size)
+        return base64.b64encode(resized_bytes).decode('utf-8')
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Error resizing image: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Error encoding image: {e}")
+        return None
+
+def request_description(base64_image):
+    # Raises requests.exceptions.RequestException when the call fails
     payload = {
-        "model": "gpt-4o-mini",
+        "model": OPENAI_MODEL,
         "messages": [
             {
                 "role": "user",
@@ -125,11 +151,20 @@ def generate_image_description(image_path):
     }
     
     logger.info("Sending request to OpenAI API")
+    response = http_session.post(OPENAI_API_URL, headers=OPENAI_HEADERS, json=payload, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()['choices'][0]['message']['content']
+
+def generate_image_description(image_path):
+    logger.info("OpenAI: Generating image description")
+    
+    base64_image, resized_filename = resize_and_encode_image(image_path)
+    if not base64_image:
+        logger.error("Failed to resize and encode image")
+        return "I'm sorry, I couldn't process the image at this time.", None
     
     try:
-        response = requests.post(OPENAI_API_URL, headers=OPENAI_HEADERS, json=payload)
-        response.raise_for_status()
-        description = response.json()['choices'][0]['message']['content']
+        description = request_description(base64_image)
         logger.info(f"OpenAI: Generated description: {description[:100]}...")
         return description, resized_filename
     except requests.exceptions.RequestException as e:
@@ -139,21 +174,24 @@ def generate_image_description(image_path):
             logger.error(f"OpenAI: Response content: {e.response.content}")
         return "I'm sorry, I couldn't generate a description at this time.", None
 
-def generate_instructions(image_description):
-    logger.info("Falcon: Generating instructions based on image description")
+def request_instructions(image_description):
+    # Raises requests.exceptions.RequestException when the call fails
     payload = {
-        "model": "tiiuae/falcon-180B-chat",
+        "model": FALCON_MODEL,
         "messages": [
             {"role": "system", "content": "You are an AI assistant helping a blind person navigate. Provide very brief, clear instructions for safe movement based on the image description."},
             {"role": "user", "content": f"Based on this image description, what should a blind person do next? Keep it brief. Image description: {image_description}"}
         ],
         "max_tokens": 100
     }
-    
+    response = http_session.post(FALCON_API_URL, headers=FALCON_HEADERS, json=payload, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()['choices'][0]['message']['content']
+
+def generate_instructions(image_description):
+    logger.info("Falcon: Generating instructions based on image description")
     try:
-        response = requests.post(FALCON_API_URL, headers=FALCON_HEADERS, json=payload)
-        response.raise_for_status()
-        instructions = response.json()['choices'][0]['message']['content']
+        instructions = request_instructions(image_description)
         logger.info(f"Falcon: Generated instructions: {instructions[:100]}...")
         return instructions
     except requests.exceptions.RequestException as e:
@@ -219,6 +257,125 @@ def process_image():
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+# Replay: runs recorded frames (a directory of images, or a manifest) through
+# the same resize -> describe -> instruct pipeline, without camera, server or
+# speech, and writes one JSON line per frame
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+REPLAY_STAGES = ('resize', 'describe', 'instruct', 'total')
+
+def load_frames(source):
+    # A manifest has one image path per line, or one JSON object per line
+    # with a "path" field (its other fields are copied to the result).
+    # Relative paths are relative to the manifest.
+    if os.path.isdir(source):
+        return [
+            {"path": os.path.join(source, name)}
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+    frames = []
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            frame = json.loads(line) if line.startswith('{') else {"path": line}
+            frame["path"] = os.path.join(base, os.path.expanduser(frame["path"]))
+            frames.append(frame)
+    return frames
+
+class RateLimiter:
+    # Starts at most `rate` frames per second (None: no limit), spread evenly
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            start = max(self.next_start, time.monotonic())
+            self.next_start = start + self.interval
+        time.sleep(max(0.0, start - time.monotonic()))
+
+def replay_frame(frame, limiter):
+    limiter.wait()
+    result = dict(frame)
+    timings = {}
+    started = time.perf_counter()
+    try:
+        stage_start = time.perf_counter()
+        base64_image = encode_image(frame["path"])
+        timings['resize'] = time.perf_counter() - stage_start
+        if base64_image is None:
+            raise ValueError("failed to resize and encode image")
+
+        stage_start = time.perf_counter()
+        result["description"] = request_description(base64_image)
+        timings['describe'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        result["instructions"] = request_instructions(result["description"])
+        timings['instruct'] = time.perf_counter() - stage_start
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        logger.error(f"Replay: {frame['path']}: {e}")
+        result["error"] = str(e)
+    timings['total'] = time.perf_counter() - started
+    result["latency_ms"] = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+    return result
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def print_report(results, elapsed):
+    errors = sum(1 for result in results if "error" in result)
+    print(f"{len(results)} frames in {elapsed:.1f} s, {errors} errors, "
+          f"{len(results) / elapsed:.2f} frames/s")
+    for stage in REPLAY_STAGES:
+        ordered = sorted(
+            result["latency_ms"][stage] for result in results
+            if "error" not in result and stage in result["latency_ms"]
+        )
+        if not ordered:
+            continue
+        print(f"{stage:<9} p50 {percentile(ordered, 0.5):8.1f} ms   p90 {percentile(ordered, 0.9):8.1f} ms   "
+              f"p95 {percentile(ordered, 0.95):8.1f} ms   p99 {percentile(ordered, 0.99):8.1f} ms   "
+              f"max {ordered[-1]:8.1f} ms")
+
+def replay(argv):
+    parser = argparse.ArgumentParser(prog="falcon-vision.py replay",
+                                     description="Run recorded frames through the pipeline")
+    parser.add_argument("source", help="directory of images, or manifest (paths or JSON lines with a \"path\")")
+    parser.add_argument("-o", "--output", default="replay.jsonl", help="JSONL results (default: replay.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="frames in flight (default: 4)")
+    parser.add_argument("-r", "--rate", type=float, default=None, help="max frames started per second")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every pipeline step")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    frames = load_frames(args.source)
+    if not frames:
+        print(f"No frames found in {args.source}")
+        return 1
+    limiter = RateLimiter(args.rate)
+    results = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool, open(args.output, "w") as output:
+        futures = [pool.submit(replay_frame, frame, limiter) for frame in frames]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    print_report(results, time.perf_counter() - started)
+    print(f"Results written to {args.output}")
+    return 0 if all("error" not in result for result in results) else 2
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        sys.exit(replay(sys.argv[2:]))
     logger.info("Starting Falcon Vision Aid application")
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+NAME_PATTERN = re.compile(r"^[0-9a-f]{32}\.jpg$")
+
+
+class FrameStore:
+    # Resized frames on disk under the hash of their content, so a name
+    # always means the same bytes and can be cached forever by browsers.
+    # Files older than max_age seconds go first, then the oldest ones until
+    # the directory is back under max_bytes. The most recently used frames
+    # are also kept in memory, up to memory_bytes.
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_age=3600, memory_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.memory_bytes = memory_bytes
+        self.index = OrderedDict()  # name -> (size, stored_at), oldest first
+        self.disk_total = 0
+        self.memory = OrderedDict()  # name -> bytes, least recently used first
+        self.memory_total = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        # Pick up the frames of a previous run so they get evicted as well
+        entries = []
+        for name in os.listdir(self.directory):
+            if NAME_PATTERN.match(name):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        now, wall_now = time.monotonic(), time.time()
+        for mtime, name, size in sorted(entries):
+            self.index[name] = (size, now - (wall_now - mtime))
+            self.disk_total += size
+        with self.lock:
+            self._evict()
+        if self.index:
+            logger.info(f"Frame store: {len(self.index)} frames ({self.disk_total} bytes) kept from a previous run")
+
+    @staticmethod
+    def valid_name(name):
+        return bool(NAME_PATTERN.match(name))
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def put(self, data):
+        name = hashlib.sha256(data).hexdigest()[:32] + ".jpg"
+        with self.lock:
+            if name in self.index:
+                # Same frame again (static scene): refresh its age
+                size, _ = self.index.pop(name)
+                self.index[name] = (size, time.monotonic())
+                self._remember(name, data)
+                return name
+        # Write then rename, a reader never sees a half written frame
+        temp_path = self.path(f".{name}.{threading.get_ident()}")
+        with open(temp_path, "wb") as image_file:
+            image_file.write(data)
+        os.replace(temp_path, self.path(name))
+        with self.lock:
+            # Another thread may have stored the same frame meanwhile, it
+            # only counts once
+            if name in self.index:
+                self.index.pop(name)
+            else:
+                self.disk_total += len(data)
+            self.index[name] = (len(data), time.monotonic())
+            self._remember(name, data)
+            self._evict()
+        return name
+
+    def get(self, name):
+        with self.lock:
+            data = self.memory.get(name)
+            if data is not None:
+                self.memory.move_to_end(name)
+                return data
+            if name not in self.index:
+                return None
+        try:
+            with open(self.path(name), "rb") as image_file:
+                data = image_file.read()
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            self._remember(name, data)
+        return data
+
+    def _remember(self, name, data):
+        if name in self.memory:
+            self.memory.move_to_end(name)
+            return
+        self.memory[name] = data
+        self.memory_total += len(data)
+        while self.memory_total > self.memory_bytes and self.memory:
+            _, old = self.memory.popitem(last=False)
+            self.memory_total -= len(old)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.index:
+            name, (size, stored_at) = next(iter(self.index.items()))
+            if self.disk_total <= self.max_bytes and now - stored_at <= self.max_age:
+                break
+            del self.index[name]
+            self.disk_total -= size
+            self.evicted += 1
+            metrics.inc("visionaid_frame_store_evicted_total")
+            old = self.memory.pop(name, None)
+            if old is not None:
+                self.memory_total -= len(old)
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "files": len(self.index),
+                "disk_bytes": self.disk_total,
+                "memory_files": len(self.memory),
+                "memory_bytes": self.memory_total,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,181 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+import payloads
+import rate_limits
+from deadlines import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Gateway errors and overloaded upstreams are worth another try, anything
+# else (bad request, auth, ...) won't get better by retrying
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# 429s are not retried by the session: the call goes back through the rate
+# limiter, which holds every thread for the Retry-After, this many times
+THROTTLE_RETRIES = 2
+
+# Weight of the newest sample in the uplink throughput average
+THROUGHPUT_SMOOTHING = 0.3
+
+# Deadline of the call in progress on this thread, for DeadlineRetry
+_local = threading.local()
+
+
+class DeadlineRetry(Retry):
+    # Stops retrying once the deadline of the calling thread's request has
+    # passed, otherwise each retry would get a fresh timeout
+    def is_exhausted(self):
+        deadline = getattr(_local, "deadline", None)
+        return super().is_exhausted() or (deadline is not None and deadline.expired)
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        # A 429's Retry-After is for every thread, the rate limiter waits it
+        # out, not this one connection
+        if status_code == 429:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def create_session(pool_size=10, retries=2, backoff_factor=0.3):
+    retry = DeadlineRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        # Chat completions are POSTs, retry them on resets and 5xx as well
+        allowed_methods=frozenset(["HEAD", "GET", "OPTIONS", "POST"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class ApiClient:
+    # One pooled keep-alive session per upstream provider, shared by every
+    # request thread so consecutive captures reuse the same TLS connection.
+    # Calls go through the provider's rate limiter first (budgets learned
+    # from the response headers unless given per minute).
+
+    def __init__(
+        self,
+        name,
+        url,
+        headers,
+        connect_timeout=3.05,
+        read_timeout=30,
+        retries=2,
+        backoff_factor=0.3,
+        pool_size=10,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_rate_wait=30.0,
+    ):
+        self.name = name
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = create_session(pool_size, retries, backoff_factor)
+        self.session.headers.update(headers)
+        self.throughput = None  # bytes/s, moving average, None until measured
+        self.rate_limiter = rate_limits.RateLimiter(
+            name, requests_per_minute, tokens_per_minute, max_rate_wait
+        )
+
+    def post(self, payload, stream=False, deadline=None):
+        if deadline is not None:
+            # Don't start a call nobody will wait for
+            deadline.check(self.name)
+        # Images in the payload are base64-encoded while the body is sent
+        body = payloads.JsonBody(payload)
+        tokens = rate_limits.estimate_tokens(payload)
+        for attempt in range(THROTTLE_RETRIES + 1):
+            # Waits for the budget, or raises RateLimited when the wait
+            # would outlast the deadline
+            self.rate_limiter.acquire(tokens, deadline)
+            response = self._send(body, stream, deadline)
+            self.rate_limiter.update(response)
+            if response.status_code != 429:
+                return response
+            response.close()
+            if attempt < THROTTLE_RETRIES:
+                logger.warning(f"{self.name}: 429 Too Many Requests, queued again ({attempt + 1}/{THROTTLE_RETRIES})")
+        raise rate_limits.RateLimited(f"{self.name}: rate limited")
+
+    def _send(self, body, stream, deadline):
+        provider = self.name.lower()
+        timeout = self.timeout
+        if deadline is not None:
+            # Don't let a call run past what is left of the frame's budget
+            deadline.check(self.name)
+            timeout = deadline.clip(timeout)
+        size = len(body)
+        metrics.inc("visionaid_upstream_requests_total", provider=provider)
+        metrics.observe("visionaid_payload_bytes", size, provider=provider)
+        _local.deadline = deadline
+        try:
+            response = self.session.post(
+                self.url,
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=timeout,
+                stream=stream,
+            )
+        except requests.exceptions.RequestException as e:
+            metrics.inc("visionaid_upstream_errors_total", provider=provider)
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(f"{self.name}: {deadline.reason}") from e
+            raise
+        finally:
+            _local.deadline = None
+        if response.status_code >= 400:
+            metrics.inc("visionaid_upstream_errors_total", provider=provider)
+        else:
+            self._measure_throughput(size, response)
+        # Retries can still run over, an answer past the deadline is useless
+        if deadline is not None and deadline.expired:
+            response.close()
+            raise DeadlineExceeded(f"{self.name}: {deadline.reason}")
+        return response
+
+    def _measure_throughput(self, size, response):
+        # Time to the response headers minus the server's own processing
+        # time (OpenAI reports it) is roughly the time the upload took.
+        # Without that header the inference time would swamp the estimate.
+        processing_ms = response.headers.get("openai-processing-ms")
+        if processing_ms is None:
+            return
+        network = response.elapsed.total_seconds() - float(processing_ms) / 1000
+        if network <= 0:
+            return
+        sample = size / network
+        if self.throughput is None:
+            self.throughput = sample
+        else:
+            self.throughput += THROUGHPUT_SMOOTHING * (sample - self.throughput)
+
+    def prewarm(self):
+        # Any answer will do (405 included), we only want the TCP+TLS
+        # handshake done and the connection parked in the pool
+        try:
+            response = self.session.head(self.url, timeout=self.timeout)
+            response.close()
+            logger.info(f"{self.name}: Connection prewarmed ({response.status_code})")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"{self.name}: Prewarm failed: {e}")
+
+
+def prewarm(clients):
+    for client in clients:
+        threading.Thread(target=client.prewarm, daemon=True).start()
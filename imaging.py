@@ -0,0 +1,178 @@
+import io
+import logging
+import subprocess
+
+try:
+    from PIL import Image, ImageFilter, ImageOps, ImageStat
+except ImportError:  # Pillow is optional, we fall back to ImageMagick
+    Image = None
+    ImageFilter = None
+    ImageOps = None
+    ImageStat = None
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 85
+
+# What Pillow raises for bytes it can't decode (truncated, corrupt, huge)
+DECODE_ERRORS = (OSError, ValueError) + ((Image.DecompressionBombError,) if Image else ())
+
+
+def parse_size(target_size):
+    width, height = target_size.lower().split("x")
+    return int(width), int(height)
+
+
+def pillow_available():
+    return Image is not None
+
+
+def resize_with_pillow(image_bytes, target_size="512x512", quality=JPEG_QUALITY):
+    size = parse_size(target_size)
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # Let the JPEG decoder downscale while decoding (DCT scaling), the
+        # result is never smaller than the requested box
+        image.draft("RGB", size)
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        # Same as magick's "-resize WxH^ -gravity center -extent WxH":
+        # scale to fill the box, then center crop the overflow
+        image = ImageOps.fit(image, size, Image.LANCZOS, centering=(0.5, 0.5))
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+
+def resize_with_magick(image_bytes, target_size="512x512", quality=JPEG_QUALITY):
+    # Pipe through stdin/stdout so the fallback doesn't touch the disk either
+    result = subprocess.run(
+        [
+            "magick",
+            "convert",
+            "-",
+            "-resize",
+            target_size + "^",
+            "-gravity",
+            "center",
+            "-extent",
+            target_size,
+            "-quality",
+            str(quality),
+            "jpg:-",
+        ],
+        input=image_bytes,
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout
+
+
+def decodable(image_bytes, size=64):
+    # Whether the whole image decodes, checked at a small draft size so it
+    # is cheap. Without Pillow there is no telling, assume it does.
+    if not pillow_available():
+        return True
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.draft("RGB", (size, size))
+            image.load()
+    except DECODE_ERRORS as e:
+        logger.warning(f"Frame does not decode: {e}")
+        return False
+    return True
+
+
+def resize_image(image_bytes, target_size="512x512", quality=JPEG_QUALITY):
+    if pillow_available():
+        try:
+            return resize_with_pillow(image_bytes, target_size, quality)
+        except Exception as e:
+            logger.warning(f"Pillow resize failed, falling back to ImageMagick: {e}")
+    return resize_with_magick(image_bytes, target_size, quality)
+
+
+def downscale(image_bytes, max_size="800x600", quality=JPEG_QUALITY):
+    # Long side down to the long side of max_size keeping the aspect ratio,
+    # never upscale. A portrait frame keeps as many pixels as a landscape
+    # one, a fixed landscape box would leave it too small for the 512x512
+    # fill that follows.
+    limit = max(parse_size(max_size))
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # A square box, so the EXIF rotation doesn't change the check
+        if max(image.size) <= limit:
+            return image_bytes
+        # Draft for the stored orientation, transposed afterwards
+        scale = limit / max(image.size)
+        image.draft("RGB", (round(image.width * scale), round(image.height * scale)))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+
+def difference_hash(image_bytes, hash_size=8):
+    # 64-bit dHash: compare neighbouring pixels of a tiny grayscale thumbnail,
+    # robust to re-encoding and small exposure changes, cheap to compare
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        image = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+        pixels = list(image.getdata())
+    fingerprint = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            fingerprint = (fingerprint << 1) | (left > right)
+    return fingerprint
+
+
+def edge_density(image_bytes, size=64, threshold=32):
+    # Share of edge pixels in a tiny grayscale thumbnail, a cheap estimate of
+    # how much detail the scene has (blank wall ~0, busy street well above 0.1)
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("L", (size, size))
+        image = image.convert("L").resize((size, size), Image.BILINEAR)
+        edges = image.filter(ImageFilter.FIND_EDGES)
+        # FIND_EDGES leaves a 1 pixel border, don't count it
+        histogram = edges.crop((1, 1, size - 1, size - 1)).histogram()
+    return sum(histogram[threshold:]) / sum(histogram)
+
+
+def frame_stats(image_bytes, size=160):
+    # Sharpness (variance of the Laplacian), mean luminance and contrast
+    # (luminance standard deviation) of a small grayscale thumbnail
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("L", (size, size))
+        image = image.convert("L")
+        image.thumbnail((size, size), Image.BILINEAR)
+        laplacian = image.filter(
+            ImageFilter.Kernel((3, 3), (0, 1, 0, 1, -4, 1, 0, 1, 0), scale=1, offset=128)
+        )
+        luminance = ImageStat.Stat(image)
+        # Skip the border, the kernel doesn't cover it
+        edges = ImageStat.Stat(laplacian.crop((1, 1, image.width - 1, image.height - 1)))
+    return {
+        "sharpness": edges.var[0],
+        "brightness": luminance.mean[0],
+        "contrast": luminance.stddev[0],
+    }
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def tile_images(images, columns=2, tile_size="512x512", quality=JPEG_QUALITY):
+    # One JPEG with the images in a grid, left to right then top to bottom,
+    # each scaled to fill its tile
+    width, height = parse_size(tile_size)
+    rows = (len(images) + columns - 1) // columns
+    mosaic = Image.new("RGB", (width * min(columns, len(images)), height * rows))
+    for number, image_bytes in enumerate(images):
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.draft("RGB", (width, height))
+            tile = ImageOps.fit(image.convert("RGB"), (width, height), Image.LANCZOS)
+        mosaic.paste(tile, ((number % columns) * width, (number // columns) * height))
+    output = io.BytesIO()
+    mosaic.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
@@ -0,0 +1,159 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r"\d+(?:[.,]\d+)?|[^\W\d_]+")
+NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+# Distances are the numbers that matter in a description, bucket them so
+# "1.6 meters" and "1.8 meters" normalize the same but "1 m" and "4 m" don't.
+# Each edge closes its bucket: 1.5 is in (1, 1.5], 1.6 in (1.5, 2].
+NUMBER_BUCKETS = (0.5, 1, 1.5, 2, 3, 5, 10, 20, 50)
+BUCKET = re.compile(r"#\d+")
+
+
+def number_bucket(token):
+    value = float(token.replace(",", "."))
+    for index, edge in enumerate(NUMBER_BUCKETS):
+        if value <= edge:
+            return f"#{index}"
+    return f"#{len(NUMBER_BUCKETS)}"
+
+
+def normalize(text):
+    tokens = []
+    for token in WORD.findall(text.casefold()):
+        tokens.append(number_bucket(token) if NUMBER.fullmatch(token) else token)
+    return " ".join(tokens)
+
+
+def buckets(key):
+    # The bucketed numbers of a normalized description, in order
+    return BUCKET.findall(key)
+
+
+def similarity(a, b):
+    # Jaccard similarity of the normalized word sets
+    a, b = set(a.split()), set(b.split())
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class InstructionCache:
+    # Maps normalized image descriptions to Falcon instructions, so an
+    # (almost) identical description skips the second network hop. Entries
+    # expire after `ttl` seconds and the least recently used are evicted
+    # beyond `max_entries`. With `db_path` entries are also written to a
+    # sqlite file and reloaded on startup.
+
+    def __init__(self, ttl=300, max_entries=256, min_similarity=0.85, db_path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self.entries = OrderedDict()  # key -> (instructions, stored_at)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS instructions "
+            "(key TEXT PRIMARY KEY, instructions TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        # Stored times are wall clock, so they stay meaningful across restarts
+        cutoff = time.time() - self.ttl
+        self.db.execute("DELETE FROM instructions WHERE stored_at < ?", (cutoff,))
+        self.db.commit()
+        rows = self.db.execute(
+            "SELECT key, instructions, stored_at FROM instructions "
+            "ORDER BY stored_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for key, instructions, stored_at in reversed(rows):
+            self.entries[key] = (instructions, stored_at)
+        logger.info(f"Instruction cache: Loaded {len(rows)} entries from {db_path}")
+
+    def _evict(self, key):
+        del self.entries[key]
+        if self.db is not None:
+            self.db.execute("DELETE FROM instructions WHERE key = ?", (key,))
+
+    def _find(self, key):
+        if key in self.entries:
+            return key, 1.0
+        # A changed distance is one word among dozens, so a near match must
+        # have the same distances: "5 meters" must not answer for "0.5"
+        distances = buckets(key)
+        best, best_score = None, 0.0
+        for candidate in self.entries:
+            if buckets(candidate) != distances:
+                continue
+            score = similarity(key, candidate)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is not None and best_score >= self.min_similarity:
+            return best, best_score
+        return None, best_score
+
+    def lookup(self, description):
+        key = normalize(description)
+        now = time.time()
+        with self.lock:
+            expired = [k for k, (_, stored_at) in self.entries.items() if now - stored_at > self.ttl]
+            for k in expired:
+                self._evict(k)
+            if expired and self.db is not None:
+                self.db.commit()
+
+            match, score = self._find(key)
+            if match is None:
+                self.misses += 1
+                logger.info(f"Instruction cache miss, hit rate {self.hit_rate:.0%}")
+                return None
+            self.hits += 1
+            self.entries.move_to_end(match)
+            logger.info(
+                f"Instruction cache hit (similarity {score:.2f}), hit rate {self.hit_rate:.0%}"
+            )
+            return self.entries[match][0]
+
+    def store(self, description, instructions):
+        key = normalize(description)
+        now = time.time()
+        with self.lock:
+            self.entries[key] = (instructions, now)
+            self.entries.move_to_end(key)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO instructions (key, instructions, stored_at) VALUES (?, ?, ?)",
+                    (key, instructions, now),
+                )
+            while len(self.entries) > self.max_entries:
+                self._evict(next(iter(self.entries)))
+            if self.db is not None:
+                self.db.commit()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+                "entries": len(self.entries),
+                "persistent": self.db is not None,
+            }
@@ -0,0 +1,172 @@
+import json
+import logging
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# timestamp: time.monotonic() of when the position was measured
+Fix = namedtuple("Fix", ["latitude", "longitude", "accuracy", "timestamp"])
+
+
+# What a location source can fail with
+READ_ERRORS = (OSError, subprocess.TimeoutExpired, ValueError, KeyError)
+
+
+class TermuxLocation:
+    # One fix from termux-location. Its elapsedMs (age of the fix, large
+    # for a passive one) dates the fix instead of the time of the call.
+    # The passive fix is whatever another app last asked for and is often
+    # minutes old: a caller that needs a fix no older than max_age gets the
+    # `fallbacks` providers asked in turn when it is older (or missing).
+
+    def __init__(self, provider="passive", fallbacks=("network", "gps"), timeout=30.0):
+        self.provider = provider
+        self.fallbacks = [fallback for fallback in fallbacks if fallback != provider]
+        self.timeout = timeout
+
+    def read(self, max_age=None):
+        providers = [self.provider] + (self.fallbacks if max_age is not None else [])
+        freshest = None
+        error = None
+        for provider in providers:
+            try:
+                fix = self._read(provider)
+            except READ_ERRORS as e:
+                logger.warning(f"Location: No fix from {provider}: {e}")
+                error = e
+                continue
+            if freshest is None or fix.timestamp > freshest.timestamp:
+                freshest = fix
+            if max_age is None or time.monotonic() - fix.timestamp <= max_age:
+                break
+            logger.info(f"Location: {provider} fix is {time.monotonic() - fix.timestamp:.0f}s old")
+        if freshest is None:
+            raise error
+        return freshest
+
+    def _read(self, provider):
+        output = subprocess.run(
+            ["termux-location", "-p", provider, "-r", "once"],
+            capture_output=True,
+            text=True,
+            timeout=self.timeout,
+        ).stdout
+        location = json.loads(output)
+        age = location.get("elapsedMs", 0) / 1000
+        return Fix(
+            location["latitude"],
+            location["longitude"],
+            location.get("accuracy"),
+            time.monotonic() - age,
+        )
+
+
+class ReplayedTrack:
+    # A recorded GPS track standing in for Termux: JSON lines with latitude,
+    # longitude, optional accuracy (meters) and optional t (seconds from the
+    # start of the track, else one fix per `spacing` seconds). read() returns
+    # the fix the track has reached since the source was created, the last
+    # one stays once the track is over.
+
+    def __init__(self, path, spacing=1.0):
+        self.fixes = []
+        with open(path) as track:
+            for number, line in enumerate(line for line in track if line.strip()):
+                point = json.loads(line)
+                self.fixes.append((point.get("t", number * spacing), point))
+        if not self.fixes:
+            raise ValueError(f"{path}: empty track")
+        self.fixes.sort(key=lambda fix: fix[0])
+        self.started_at = time.monotonic()
+
+    def read(self, max_age=None):
+        elapsed = time.monotonic() - self.started_at
+        offset, point = self.fixes[0]
+        for fix_offset, fix_point in self.fixes:
+            if fix_offset > elapsed:
+                break
+            offset, point = fix_offset, fix_point
+        return Fix(
+            point["latitude"],
+            point["longitude"],
+            point.get("accuracy"),
+            self.started_at + offset,
+        )
+
+
+class LocationService:
+    # Keeps the last fix from `source`, refreshed every `interval` seconds on
+    # a background thread so "where am I" doesn't wait on the GPS. A caller
+    # needing a fresher fix than the cached one wakes the thread up and waits
+    # for the next fix, at most `timeout` seconds; that read passes the
+    # caller's max_age on to the source.
+
+    def __init__(self, source, interval=30.0):
+        self.source = source
+        self.interval = interval
+        self.fix = None
+        self.errors = 0
+        self.wanted_age = None
+        self.wake = threading.Event()
+        self.updated = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="location", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            max_age, self.wanted_age = self.wanted_age, None
+            try:
+                fix = self.source.read(max_age)
+            except READ_ERRORS as e:
+                self.errors += 1
+                logger.error(f"Location: Error getting a fix: {e}")
+                fix = None
+            with self.updated:
+                if fix is not None:
+                    self.fix = fix
+                self.updated.notify_all()
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def current(self, max_age=None):
+        # Cached fix, None when there is none or it is older than max_age
+        fix = self.fix
+        if fix is None or (max_age is not None and self.age(fix) > max_age):
+            return None
+        return fix
+
+    def get(self, max_age, timeout=10.0):
+        # A fix no older than max_age: from cache if possible, else the next
+        # one measured (None if that takes longer than timeout)
+        fix = self.current(max_age)
+        if fix is not None:
+            return fix
+        with self.updated:
+            self.wanted_age = max_age
+            self.wake.set()
+            give_up_at = time.monotonic() + timeout
+            while self.current(max_age) is None and time.monotonic() < give_up_at:
+                self.updated.wait(give_up_at - time.monotonic())
+        return self.current(max_age)
+
+    @staticmethod
+    def age(fix):
+        return time.monotonic() - fix.timestamp
+
+    def describe(self, fix=None):
+        # JSON-friendly form of a fix, for results
+        fix = fix or self.fix
+        if fix is None:
+            return None
+        return {
+            "latitude": fix.latitude,
+            "longitude": fix.longitude,
+            "accuracy": fix.accuracy,
+            "age": round(self.age(fix), 1),
+        }
@@ -0,0 +1,143 @@
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Percentiles are computed over the most recent observations only
+WINDOW = 1024
+
+METRICS = {
+    "visionaid_stage_seconds": ("summary", "Time spent in each processing stage"),
+    "visionaid_encoded_bytes": ("summary", "Encoded frame size per target size"),
+    "visionaid_bytes_saved": ("summary", "Bytes saved by adaptive encoding (sampled frames)"),
+    "visionaid_vision_seconds": ("summary", "Vision call latency per frame size"),
+    "visionaid_payload_bytes": ("summary", "Request body size sent to each provider"),
+    "visionaid_provider_seconds": ("summary", "Latency of successful calls per provider"),
+    "visionaid_provider_failures_total": ("counter", "Failed calls (errors, 4xx/5xx, rate limited) per provider"),
+    "visionaid_failovers_total": ("counter", "Calls failed over to the next provider, per stage and failed provider"),
+    "visionaid_hedged_calls_total": ("counter", "Hedged calls per stage, by which request won"),
+    "visionaid_upstream_requests_total": ("counter", "Requests sent to each provider"),
+    "visionaid_upstream_errors_total": ("counter", "Failed requests per provider"),
+    "visionaid_rate_limit_wait_seconds": ("summary", "Time calls queued for each provider's rate limit"),
+    "visionaid_rate_limited_total": ("counter", "429s received (throttled) and calls refused by the rate limiter, per provider"),
+    "visionaid_http_requests_total": ("counter", "HTTP requests per endpoint"),
+    "visionaid_cache_hit_ratio": ("gauge", "Hit ratio of each cache"),
+    "visionaid_no_fresh_data_total": ("counter", "Captures answered too late, or superseded"),
+    "visionaid_delta_frames_total": ("counter", "Delta instruction frames: unchanged scene, nothing new, or new hazards"),
+    "visionaid_around_views": ("summary", "Distinct views described per around-me request"),
+    "visionaid_instruction_tokens": ("summary", "Prompt and completion tokens per instruction request"),
+    "visionaid_frames_checked_total": ("counter", "Frames checked by the quality gate"),
+    "visionaid_frames_rejected_total": ("counter", "Frames rejected by the quality gate, by reason"),
+    "visionaid_frame_rejection_ratio": ("gauge", "Share of frames rejected by the quality gate"),
+    "visionaid_frame_store_bytes": ("gauge", "Bytes of preview frames stored, by tier (disk, memory)"),
+    "visionaid_frame_store_evicted_total": ("counter", "Preview frames evicted from the frame store"),
+    "visionaid_sessions": ("gauge", "Client sessions currently tracked"),
+    "visionaid_pool_waiting": ("gauge", "Frames waiting for an inference worker"),
+    "visionaid_pool_busy": ("gauge", "Inference workers busy"),
+    "visionaid_pool_jobs_total": ("counter", "Inference jobs completed, superseded or refused"),
+    "visionaid_speech_utterances": ("gauge", "Utterances queued, spoken, dropped or preempted"),
+}
+
+
+class Summary:
+    def __init__(self):
+        self.values = deque(maxlen=WINDOW)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.values:
+            return float("nan")
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Registry:
+    def __init__(self):
+        self.summaries = {}
+        self.counters = {}
+        self.gauges = {}  # (name, labels) -> callable, evaluated at render time
+        self.lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.summaries.setdefault(key, Summary()).observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, fn, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    def quantiles(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                return None
+            return {q: summary.quantile(q) for q in QUANTILES}
+
+    def render(self):
+        # Prometheus text exposition format
+        with self.lock:
+            samples = {}
+            for (name, labels), summary in self.summaries.items():
+                lines = samples.setdefault(name, [])
+                for q in QUANTILES:
+                    lines.append((name, labels + (("quantile", str(q)),), summary.quantile(q)))
+                lines.append((f"{name}_sum", labels, summary.sum))
+                lines.append((f"{name}_count", labels, summary.count))
+            for (name, labels), value in self.counters.items():
+                samples.setdefault(name, []).append((name, labels, value))
+        for (name, labels), fn in self.gauges.items():
+            samples.setdefault(name, []).append((name, labels, fn()))
+
+        output = []
+        for name in sorted(samples):
+            kind, help_text = METRICS.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in samples[name]:
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                label_text = f"{{{label_text}}}" if label_text else ""
+                output.append(f"{sample}{label_text} {value}")
+        return "\n".join(output) + "\n"
+
+
+REGISTRY = Registry()
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+gauge = REGISTRY.gauge
+render = REGISTRY.render
+
+
+@contextmanager
+def timed(stage):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe("visionaid_stage_seconds", time.monotonic() - start, stage=stage)
+
+
+def timed_function(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,39 @@
+import threading
+
+import imaging
+
+
+class ViewSelector:
+    # Picks the distinct views of a burst taken while the user turns around.
+    # A frame is kept when its dHash differs from every kept frame by more
+    # than `min_distance` bits (out of 64), so the frames of a pause or a
+    # slow turn don't fill the request with the same view; at most
+    # `max_views` are kept, in capture order. Without a fingerprint (no
+    # Pillow) frames are kept as long as there is room.
+
+    def __init__(self, min_distance=16, max_views=4):
+        self.min_distance = min_distance
+        self.max_views = max_views
+        self.fingerprints = []
+        self.lock = threading.Lock()
+
+    def offer(self, fingerprint):
+        # True when the frame is a new view and was kept
+        with self.lock:
+            if self.full:
+                return False
+            if fingerprint is not None and any(
+                imaging.hamming_distance(fingerprint, kept) <= self.min_distance
+                for kept in self.fingerprints
+                if kept is not None
+            ):
+                return False
+            self.fingerprints.append(fingerprint)
+            return True
+
+    @property
+    def full(self):
+        return len(self.fingerprints) >= self.max_views
+
+    def __len__(self):
+        return len(self.fingerprints)
@@ -0,0 +1,67 @@
+import base64
+import json
+import re
+
+# Raw bytes base64-encoded at a time, a multiple of 3 so the encoded chunks
+# join into one valid base64 string
+CHUNK_SIZE = 12 * 1024
+
+# What an ImageData serializes to before JsonBody splices the image back in
+_PLACEHOLDER = re.compile(r'"\\u0000image(\d+)\\u0000"')
+
+
+class ImageData:
+    # A JPEG to be sent as a data URL, in place of the "url" string of an
+    # image_url part. Keeps only the raw bytes: the base64 text is produced
+    # in small chunks while the request body is sent, never as a whole.
+
+    def __init__(self, image_bytes, mime_type="image/jpeg"):
+        self.image_bytes = image_bytes
+        self.prefix = f"data:{mime_type};base64,".encode("ascii")
+
+    def __len__(self):
+        # Length of the data URL
+        return len(self.prefix) + 4 * ((len(self.image_bytes) + 2) // 3)
+
+    def chunks(self):
+        yield self.prefix
+        view = memoryview(self.image_bytes)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield base64.b64encode(view[start:start + CHUNK_SIZE])
+
+
+class JsonBody:
+    # JSON request body of a payload that may contain ImageData. The payload
+    # around the images (prompts, model, ...) is serialized once, the images
+    # are base64-encoded chunk by chunk as the body is iterated. Can be
+    # iterated again (retries, a hedged call to a second provider), and knows
+    # its length so requests sends a Content-Length instead of chunking.
+
+    def __init__(self, payload):
+        images = []
+
+        def placeholder(value):
+            if not isinstance(value, ImageData):
+                raise TypeError(f"{type(value).__name__} is not JSON serializable")
+            images.append(value)
+            return f"\0image{len(images) - 1}\0"
+
+        text = json.dumps(payload, default=placeholder)
+        self.parts = []  # bytes, or the ImageData to splice in between
+        # The quotes around a placeholder stay, only its content is replaced
+        position = 0
+        for match in _PLACEHOLDER.finditer(text):
+            self.parts.append(text[position:match.start() + 1].encode("utf-8"))
+            self.parts.append(images[int(match.group(1))])
+            position = match.end() - 1
+        self.parts.append(text[position:].encode("utf-8"))
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, ImageData):
+                yield from part.chunks()
+            else:
+                yield part
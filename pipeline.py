@@ -0,0 +1,145 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def put_latest(frames, frame):
+    # Bounded hand-off between stages: a newer frame replaces whatever the
+    # next stage hasn't picked up yet, stale frames are dropped, not queued
+    dropped = 0
+    while True:
+        try:
+            frames.put_nowait(frame)
+            return dropped
+        except queue.Full:
+            try:
+                frames.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class LivePipeline:
+    # Runs capture -> stage 1 -> ... -> stage N concurrently, one thread per
+    # stage, so frame N+1 is captured and resized while frame N is still in
+    # inference. Throughput is bound by the slowest stage, not the sum.
+    #
+    # capture() returns the raw frame bytes (or None to skip), each stage is a
+    # (name, fn) pair where fn(frame) updates and returns the frame dict, or
+    # returns None to drop it. on_event(stage_name, frame) is called after
+    # every stage so results can be published as soon as they are ready.
+
+    def __init__(
+        self, capture, stages, on_event=None, queue_size=1, capture_interval=0.0
+    ):
+        self.capture = capture
+        self.stages = stages
+        self.on_event = on_event
+        self.capture_interval = capture_interval
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.frame_ids = itertools.count(1)
+        self.latest_result = None
+        self.stats = {
+            name: {"processed": 0, "skipped": 0, "dropped": 0, "errors": 0}
+            for name in ["capture"] + [name for name, _ in stages]
+        }
+        self.lock = threading.Lock()
+
+    @property
+    def running(self):
+        return bool(self.threads) and not self.stop_event.is_set()
+
+    def start(self):
+        self.stop_event.clear()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="live-capture", daemon=True)
+        ]
+        for index, (name, fn) in enumerate(self.stages):
+            self.threads.append(
+                threading.Thread(
+                    target=self._stage_loop,
+                    args=(index, name, fn),
+                    name=f"live-{name}",
+                    daemon=True,
+                )
+            )
+        for thread in self.threads:
+            thread.start()
+        logger.info(f"Live pipeline started with stages: {[name for name, _ in self.stages]}")
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        logger.info(f"Live pipeline stopped: {self.stats}")
+
+    def _count(self, name, key, amount=1):
+        with self.lock:
+            self.stats[name][key] += amount
+
+    def _publish(self, name, frame):
+        if self.on_event and not self.stop_event.is_set():
+            try:
+                self.on_event(name, frame)
+            except Exception as e:
+                logger.error(f"Live pipeline: Error publishing {name} event: {e}")
+
+    def _capture_loop(self):
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                image_bytes = self.capture()
+            except Exception as e:
+                logger.error(f"Live pipeline: Error capturing frame: {e}")
+                image_bytes = None
+                self._count("capture", "errors")
+            if image_bytes:
+                frame = {
+                    "id": next(self.frame_ids),
+                    "captured_at": time.monotonic(),
+                    "image_bytes": image_bytes,
+                }
+                self._count("capture", "processed")
+                dropped = put_latest(self.queues[0], frame)
+                self._count(self.stages[0][0], "dropped", dropped)
+            # Don't spin on the camera faster than asked to
+            remaining = self.capture_interval - (time.monotonic() - started)
+            if remaining > 0:
+                self.stop_event.wait(remaining)
+
+    def _stage_loop(self, index, name, fn):
+        inbox = self.queues[index]
+        next_stage = self.stages[index + 1][0] if index + 1 < len(self.stages) else None
+        while not self.stop_event.is_set():
+            try:
+                frame = inbox.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                frame = fn(frame)
+            except Exception as e:
+                logger.error(f"Live pipeline: Error in {name} stage: {e}")
+                self._count(name, "errors")
+                continue
+            if frame is None:
+                self._count(name, "skipped")
+                continue
+            self._count(name, "processed")
+            self._publish(name, frame)
+            if next_stage is not None:
+                # "dropped" counts frames superseded while waiting for a stage
+                dropped = put_latest(self.queues[index + 1], frame)
+                self._count(next_stage, "dropped", dropped)
+            else:
+                frame["latency"] = time.monotonic() - frame["captured_at"]
+                self.latest_result = frame
+                logger.info(
+                    f"Live pipeline: Frame {frame['id']} done in {frame['latency']:.2f}s"
+                )
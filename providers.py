@@ -0,0 +1,259 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+
+import metrics
+from deadlines import Deadline, DeadlineExceeded
+from rate_limits import RateLimited
+
+logger = logging.getLogger(__name__)
+
+# Latency percentiles are computed over the last calls of each provider only
+LATENCY_WINDOW = 50
+
+# Error rates are computed over the calls of the last ERROR_WINDOW seconds,
+# so a provider that failed gets another chance once they are forgotten.
+# Past UNHEALTHY_ERROR_RATE it is ranked after every healthy provider.
+ERROR_WINDOW = 60.0
+UNHEALTHY_ERROR_RATE = 0.5
+
+
+def worth_failing_over(response, error):
+    # Connection errors, 5xx and exhausted rate limits may go better on
+    # another provider; a deadline or a bad request won't
+    if error is not None:
+        return isinstance(error, (requests.exceptions.RequestException, RateLimited))
+    return response.status_code >= 500
+
+
+class Provider:
+    # One OpenAI-compatible chat-completions endpoint, with the model to ask
+    # for there (None keeps the payload's model), its recent latencies and
+    # the outcomes of its recent calls
+
+    def __init__(self, name, client, model=None):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=LATENCY_WINDOW)  # (monotonic time, succeeded)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+        metrics.observe("visionaid_provider_seconds", seconds, provider=self.name)
+
+    def record(self, succeeded):
+        with self.lock:
+            self.outcomes.append((time.monotonic(), succeeded))
+        if not succeeded:
+            metrics.inc("visionaid_provider_failures_total", provider=self.name)
+
+    def error_rate(self):
+        since = time.monotonic() - ERROR_WINDOW
+        with self.lock:
+            recent = [succeeded for at, succeeded in self.outcomes if at >= since]
+        return recent.count(False) / len(recent) if recent else 0.0
+
+    def quantile(self, q):
+        with self.lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def post(self, payload, stream=False, deadline=None):
+        if self.model:
+            payload = dict(payload, model=self.model)
+        start = time.monotonic()
+        try:
+            response = self.client.post(payload, stream=stream, deadline=deadline)
+        except RateLimited:
+            self.record(False)
+            raise
+        except DeadlineExceeded:
+            # Cancelled or out of time: not the provider's failure
+            raise
+        except Exception:
+            self.record(False)
+            raise
+        self.record(response.status_code < 400)
+        if response.status_code < 400 and not stream:
+            self.observe(time.monotonic() - start)
+        return response
+
+
+class ProviderPool:
+    # Routes each call to the provider with the lowest median latency. When
+    # the answer takes longer than that provider's p90, the same request is
+    # sent to the next fastest provider (a hedge) and the first successful
+    # answer wins; the other call is cancelled. Hedges are limited to
+    # `hedge_budget` of all calls so a slow period can't double the bill.
+
+    def __init__(self, stage, providers, hedge_budget=0.1, min_samples=10):
+        self.stage = stage
+        self.providers = providers
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.calls = 0
+        self.hedges = 0
+        self.lock = threading.Lock()
+
+    def ranked(self):
+        # Healthy providers first, measured ones by expected latency of a
+        # successful answer (median / success rate), then those not measured
+        # yet (they get measured as hedges and failovers), then the failing
+        def rank(provider):
+            errors = provider.error_rate()
+            measured = len(provider.latencies) >= self.min_samples
+            expected = provider.quantile(0.5) / (1 - errors) if measured and errors < 1 else 0.0
+            return (errors >= UNHEALTHY_ERROR_RATE, not measured, expected)
+
+        return sorted(self.providers, key=rank)
+
+    def primary(self):
+        return self.ranked()[0]
+
+    def _hedge_delay(self, provider):
+        if len(provider.latencies) < self.min_samples:
+            return None
+        return provider.quantile(0.9)
+
+    def _may_hedge(self):
+        with self.lock:
+            return self.hedges < self.hedge_budget * self.calls
+
+    def post(self, payload, deadline=None):
+        with self.lock:
+            self.calls += 1
+        ranked = self.ranked()
+        primary = ranked[0]
+        hedge_delay = self._hedge_delay(primary)
+        if len(ranked) == 1:
+            return primary.post(payload, deadline=deadline)
+        if hedge_delay is None or not self.hedge_budget:
+            return self._post_in_turn(ranked, payload, deadline)
+
+        results = queue.Queue()
+        calls = []
+
+        def launch(provider):
+            # Own deadline per call so the loser can be cancelled alone
+            call_deadline = Deadline(parent=deadline)
+            started = time.monotonic()
+
+            def run():
+                try:
+                    results.put((provider, provider.post(payload, deadline=call_deadline), None))
+                except Exception as e:
+                    results.put((provider, None, e))
+
+            calls.append((provider, call_deadline, started))
+            threading.Thread(target=run, name=f"{self.stage}-{provider.name}", daemon=True).start()
+
+        launch(primary)
+        pending = 1
+        hedged = False
+        last = (None, None, None)
+        while pending:
+            timeout = hedge_delay if not hedged else None
+            if deadline is not None and deadline.remaining() is not None:
+                timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+            try:
+                provider, response, error = results.get(timeout=timeout)
+            except queue.Empty:
+                if deadline is not None and deadline.expired:
+                    break
+                if not hedged and self._may_hedge():
+                    logger.info(
+                        f"{self.stage}: {primary.name} slower than its p90 "
+                        f"({hedge_delay:.2f}s), hedging to {ranked[1].name}"
+                    )
+                    with self.lock:
+                        self.hedges += 1
+                    launch(ranked[1])
+                    pending += 1
+                hedged = True
+                continue
+            pending -= 1
+            if error is None and response.status_code < 400:
+                self._cancel_others(provider, calls, hedged)
+                return response
+            last = (provider, response, error)
+            # The primary failed outright: fail over now instead of at p90,
+            # whatever is left of the hedge budget
+            if not hedged and len(calls) == 1 and worth_failing_over(response, error):
+                self._failed_over(provider, ranked[1], error or response.status_code)
+                launch(ranked[1])
+                pending += 1
+                hedged = True
+
+        for _, call_deadline, _ in calls:
+            call_deadline.cancel()
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded(f"{self.stage}: {deadline.reason}")
+        _, response, error = last
+        if error is not None:
+            raise error
+        return response
+
+    def _post_in_turn(self, ranked, payload, deadline):
+        # No hedging: the next provider is only asked when one fails
+        error = None
+        for number, provider in enumerate(ranked):
+            last = number == len(ranked) - 1
+            try:
+                response = provider.post(payload, deadline=deadline)
+            except Exception as e:
+                if last or not worth_failing_over(None, e):
+                    raise
+                error = e
+                self._failed_over(provider, ranked[number + 1], e)
+                continue
+            if last or not worth_failing_over(response, None):
+                return response
+            response.close()
+            self._failed_over(provider, ranked[number + 1], response.status_code)
+        raise error
+
+    def _failed_over(self, provider, to, why=None):
+        logger.warning(f"{self.stage}: {provider.name} failed ({why}), failing over to {to.name}")
+        metrics.inc("visionaid_failovers_total", stage=self.stage, provider=provider.name)
+
+    def _cancel_others(self, winner, calls, hedged):
+        now = time.monotonic()
+        for provider, call_deadline, started in calls:
+            if provider is winner:
+                continue
+            call_deadline.cancel()
+            # What the loser took so far is a lower bound of its latency,
+            # without it a provider that always loses would never look slow
+            provider.observe(now - started)
+        if hedged:
+            outcome = "primary" if winner is calls[0][0] else "hedge"
+            metrics.inc("visionaid_hedged_calls_total", stage=self.stage, winner=outcome)
+
+    def prewarm(self):
+        for provider in self.providers:
+            provider.client.prewarm()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "providers": {
+                provider.name: {
+                    "samples": len(provider.latencies),
+                    "p50": provider.quantile(0.5),
+                    "p90": provider.quantile(0.9),
+                    "error_rate": provider.error_rate(),
+                    "rate_limit": provider.client.rate_limiter.stats(),
+                }
+                for provider in self.providers
+            },
+        }
@@ -0,0 +1,76 @@
+import logging
+import threading
+
+import imaging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# What to tell the user when no usable frame could be taken
+REJECTION_MESSAGES = {
+    "dark": "Frame too dark, is the camera covered?",
+    "uniform": "Camera view is blocked",
+    "blurry": "Frame too blurry, hold the phone still",
+    "unreadable": "Frame is not an image",
+}
+
+
+class QualityGate:
+    # Rejects frames that can't produce useful guidance before they cost a
+    # vision and a Falcon call: too dark (camera in a pocket), nearly uniform
+    # (lens covered) or too blurry (motion blur while walking). Thresholds
+    # apply to a 160 px grayscale thumbnail, see imaging.frame_stats.
+
+    def __init__(self, min_sharpness=30.0, min_brightness=25.0, min_contrast=8.0):
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.min_contrast = min_contrast
+        self.checked = 0
+        self.rejected = {}
+        self.lock = threading.Lock()
+
+    def check(self, image_bytes):
+        # Returns why the frame is rejected, or None when it is usable
+        if not imaging.pillow_available():
+            return None
+        try:
+            with metrics.timed("quality_check"):
+                stats = imaging.frame_stats(image_bytes)
+        except imaging.DECODE_ERRORS as e:
+            # Truncated or corrupt: nothing to describe either
+            logger.warning(f"Quality gate: Frame does not decode: {e}")
+            stats = None
+        if stats is None:
+            reason = "unreadable"
+        elif stats["brightness"] < self.min_brightness:
+            reason = "dark"
+        elif stats["contrast"] < self.min_contrast:
+            reason = "uniform"
+        elif stats["sharpness"] < self.min_sharpness:
+            reason = "blurry"
+        else:
+            reason = None
+        with self.lock:
+            self.checked += 1
+            if reason:
+                self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        metrics.inc("visionaid_frames_checked_total")
+        if reason:
+            metrics.inc("visionaid_frames_rejected_total", reason=reason)
+        if reason and stats is not None:
+            logger.info(
+                f"Quality gate: Frame rejected ({reason}): sharpness "
+                f"{stats['sharpness']:.1f}, brightness {stats['brightness']:.1f}, "
+                f"contrast {stats['contrast']:.1f}"
+            )
+        return reason
+
+    @property
+    def rejection_rate(self):
+        with self.lock:
+            return sum(self.rejected.values()) / self.checked if self.checked else 0.0
+
+    def stats(self):
+        with self.lock:
+            checked, rejected = self.checked, dict(self.rejected)
+        return {"checked": checked, "rejected": rejected, "rejection_rate": self.rejection_rate}
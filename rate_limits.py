@@ -0,0 +1,228 @@
+import email.utils
+import logging
+import re
+import threading
+import time
+
+import metrics
+from deadlines import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Wait after a 429 without a usable Retry-After
+DEFAULT_RETRY_AFTER = 1.0
+
+# Image tokens per image_url part, by detail (high: a 512 px frame is at
+# most 4 tiles of 170 tokens plus the base 85)
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+# Completion tokens assumed when a payload sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 300
+
+# "120ms", "1s", "6m0s", "1h2m3.5s"
+DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimited(DeadlineExceeded):
+    # The provider's budget can't take the call before the caller gives up
+    pass
+
+
+def parse_duration(value):
+    # Seconds, from a plain number or OpenAI's "6m0s" form; None if unreadable
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers):
+    # Seconds to wait from retry-after-ms or Retry-After (seconds or an
+    # HTTP date), None without either
+    if headers.get("retry-after-ms"):
+        try:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(payload):
+    # Upper bound of the tokens a chat-completions call will be charged:
+    # ~4 characters per text token, a fixed cost per image, and max_tokens
+    text = 0
+    images = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            text += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                images += IMAGE_TOKENS.get(part["image_url"].get("detail", "auto"), IMAGE_TOKENS["auto"])
+            elif isinstance(part.get("text"), str):
+                text += len(part["text"])
+    completion = payload.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    return text // 4 + images + completion
+
+
+class Bucket:
+    # Token bucket refilled at `per_minute` / 60 per second, holding at most
+    # `burst_seconds` of refill. A reservation may take the level below zero:
+    # the caller gets its place in line right away and waits until the
+    # bucket has refilled up to it, so callers queue in arrival order. No
+    # rate means no limit.
+
+    def __init__(self, per_minute=None, burst_seconds=1.0):
+        self.burst_seconds = burst_seconds
+        self.set_rate(per_minute)
+
+    def set_rate(self, per_minute):
+        self.per_minute = per_minute or None
+        self.rate = per_minute / 60 if per_minute else None
+        self.capacity = max(1.0, self.rate * self.burst_seconds) if self.rate else None
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.rate:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        # Seconds until the reservation is covered
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount):
+        if self.rate:
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining, now):
+        # The provider's count only lowers ours: it doesn't know about the
+        # calls still on their way
+        if self.rate and remaining is not None:
+            self._refill(now)
+            self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    # Request and token budgets of one provider, shared by every thread
+    # calling it. acquire() reserves a request and its estimated tokens
+    # before the call is sent and sleeps until both budgets cover it, so
+    # calls queue up ahead of time instead of bouncing off 429s. Budgets are
+    # configured (per minute) or learned from the provider's
+    # x-ratelimit-limit-* headers; x-ratelimit-remaining-* lowers them, and
+    # a 429 holds back every caller for its Retry-After. A call that would
+    # wait past its deadline (or `max_wait`) is refused with RateLimited.
+
+    def __init__(self, name, requests_per_minute=None, tokens_per_minute=None, max_wait=30.0, burst_seconds=1.0):
+        self.name = name
+        self.requests = Bucket(requests_per_minute, burst_seconds)
+        self.tokens = Bucket(tokens_per_minute, burst_seconds)
+        # Configured budgets win over the headers
+        self.configured = {"requests": bool(requests_per_minute), "tokens": bool(tokens_per_minute)}
+        self.max_wait = max_wait
+        self.blocked_until = 0.0
+        self.throttled = 0  # 429s received
+        self.refused = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens, deadline=None):
+        limit = self.max_wait
+        if deadline is not None and deadline.remaining() is not None:
+            limit = min(limit, deadline.remaining())
+        with self.lock:
+            now = time.monotonic()
+            wait = max(
+                self.requests.reserve(1, now),
+                self.tokens.reserve(tokens, now),
+                self.blocked_until - now,
+            )
+            if wait > limit:
+                self.requests.refund(1)
+                self.tokens.refund(tokens)
+                self.refused += 1
+        provider = self.name.lower()
+        if wait > limit:
+            metrics.inc("visionaid_rate_limited_total", provider=provider, outcome="refused")
+            raise RateLimited(f"{self.name}: rate limited")
+        metrics.observe("visionaid_rate_limit_wait_seconds", wait, provider=provider)
+        if wait <= 0:
+            return
+        logger.info(f"{self.name}: Queued {wait:.2f}s for the rate limit")
+        if deadline is None:
+            time.sleep(wait)
+            return
+        deadline.cancel_event.wait(wait)
+        if deadline.expired:
+            # Nobody will use the slot, give it to the next caller
+            with self.lock:
+                self.requests.refund(1)
+                self.tokens.refund(tokens)
+            deadline.check(self.name)
+
+    def update(self, response):
+        # Budgets from the response headers, and a pause after a 429
+        headers = response.headers
+        with self.lock:
+            now = time.monotonic()
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                if limit and not self.configured[kind]:
+                    try:
+                        per_minute = float(limit)
+                    except ValueError:
+                        per_minute = None
+                    if per_minute and per_minute != bucket.per_minute:
+                        logger.info(f"{self.name}: {kind} budget is {per_minute:g}/min")
+                        bucket.set_rate(per_minute)
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    remaining = float(remaining) if remaining is not None else None
+                except ValueError:
+                    remaining = None
+                bucket.sync(remaining, now)
+                if remaining == 0:
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self.blocked_until = max(self.blocked_until, now + reset)
+            if response.status_code == 429:
+                retry_after = parse_retry_after(headers)
+                if retry_after is None:
+                    retry_after = DEFAULT_RETRY_AFTER
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.throttled += 1
+        if response.status_code == 429:
+            logger.warning(f"{self.name}: Rate limited by the provider, holding calls for {retry_after:.1f}s")
+            metrics.inc("visionaid_rate_limited_total", provider=self.name.lower(), outcome="throttled")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests_per_minute": self.requests.per_minute,
+                "tokens_per_minute": self.tokens.per_minute,
+                "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                "throttled": self.throttled,
+                "refused": self.refused,
+            }
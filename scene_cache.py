@@ -0,0 +1,73 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import imaging
+
+logger = logging.getLogger(__name__)
+
+
+class SceneCache:
+    # Bounded LRU of recent scene fingerprints mapped to their results. A new
+    # frame within `threshold` bits of a cached fingerprint is considered the
+    # same scene, so its description/instructions can be reused as is.
+    # Entries belong to the session that stored them: a client is never
+    # served what another client's camera saw.
+
+    def __init__(self, threshold=6, max_entries=32):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, fingerprint, session=None):
+        if fingerprint is None:
+            return None
+        with self.lock:
+            best, best_distance = None, None
+            for key in self.entries:
+                owner, cached = key
+                if owner != session:
+                    continue
+                distance = imaging.hamming_distance(fingerprint, cached)
+                if distance <= self.threshold and (
+                    best_distance is None or distance < best_distance
+                ):
+                    best, best_distance = key, distance
+            if best is None:
+                self.misses += 1
+                logger.info(f"Scene cache miss, hit rate {self.hit_rate:.0%}")
+                return None
+            self.hits += 1
+            self.entries.move_to_end(best)
+            logger.info(
+                f"Scene cache hit (distance {best_distance}), hit rate {self.hit_rate:.0%}"
+            )
+            return self.entries[best]
+
+    def store(self, fingerprint, result, session=None):
+        if fingerprint is None:
+            return
+        key = (session, fingerprint)
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+                "entries": len(self.entries),
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,77 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+# Numbers keep their decimals, a chair going from 2 to 1.5 meters is a change
+WORD = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+STOPWORDS = {"a", "an", "the", "of", "on", "in", "at", "to", "with", "and", "is", "are", "there", "it", "its"}
+
+
+def sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_END.split(text or "") if sentence.strip()]
+
+
+def words(text):
+    return {word for word in WORD.findall(text.lower()) if word not in STOPWORDS}
+
+
+def same_sentence(a, b, threshold):
+    # Word sets of two sentences: same numbers, and enough words in common
+    if {word for word in a if word[0].isdigit()} != {word for word in b if word[0].isdigit()}:
+        return False
+    return len(a & b) / len(a | b) >= threshold if a or b else True
+
+
+class SceneState:
+    # What a session's user already knows: the sentences of the previous
+    # description and the hazards announced lately. changes() tells which
+    # sentences of a new description are new (no previous sentence has the
+    # same distances and `threshold` of its words), so the instruction request only carries
+    # those. The state is forgotten after `ttl` seconds without a frame, and
+    # a hazard after `hazard_ttl` seconds, so it gets announced again.
+
+    def __init__(self, ttl=15.0, hazard_ttl=30.0, threshold=0.7, max_hazards=8):
+        self.ttl = ttl
+        self.hazard_ttl = hazard_ttl
+        self.threshold = threshold
+        self.max_hazards = max_hazards
+        self.previous = []  # word sets of the previous description's sentences
+        self.updated_at = None
+        self.hazards = OrderedDict()  # announced hazard -> when, oldest first
+        self.lock = threading.Lock()
+
+    def changes(self, description):
+        # (new or changed sentences, hazards already announced)
+        now = time.monotonic()
+        with self.lock:
+            if self.updated_at is None or now - self.updated_at > self.ttl:
+                self.previous = []
+                self.hazards.clear()
+            changed = [
+                sentence
+                for sentence in sentences(description)
+                if not any(same_sentence(words(sentence), old, self.threshold) for old in self.previous)
+            ]
+            announced = [
+                hazard for hazard, when in self.hazards.items() if now - when <= self.hazard_ttl
+            ]
+            return changed, announced
+
+    def update(self, description, instructions):
+        now = time.monotonic()
+        with self.lock:
+            self.previous = [words(sentence) for sentence in sentences(description)]
+            self.updated_at = now
+            for hazard in sentences(instructions):
+                self.hazards.pop(hazard, None)
+                self.hazards[hazard] = now
+            while len(self.hazards) > self.max_hazards:
+                self.hazards.popitem(last=False)
+
+    def reset(self):
+        with self.lock:
+            self.previous = []
+            self.updated_at = None
+            self.hazards.clear()
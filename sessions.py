@@ -0,0 +1,63 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import deadlines
+import scene_state
+
+
+def session_id(client_id):
+    # Session ids end up in file names and logs: a hash of the client id,
+    # so distinct addresses ("10.0.0.11", "100.0.1.1", "::1") stay distinct
+    return hashlib.sha256((client_id or "anonymous").encode("utf-8")).hexdigest()[:16]
+
+
+class Session:
+    # One client (a phone, a browser tab, or the server's own camera): its
+    # own frame numbering and its own deadlines, so a client's new frame
+    # only supersedes that client's older frames, and what it has already
+    # been told about its surroundings
+
+    def __init__(self, session_id, budget=None, scene_ttl=15.0):
+        self.id = session_id
+        self.frame_numbers = itertools.count(1)
+        self.deadlines = deadlines.Latest(budget)
+        self.scene = scene_state.SceneState(scene_ttl)
+        self.last_seen = time.monotonic()
+
+    def next_frame(self):
+        return next(self.frame_numbers)
+
+
+class SessionRegistry:
+    # Sessions by client id, forgotten after `ttl` idle seconds, at most
+    # `max_sessions` of them (least recently seen goes first)
+
+    def __init__(self, budget=None, ttl=300.0, max_sessions=256, scene_ttl=15.0):
+        self.budget = budget
+        self.scene_ttl = scene_ttl
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, client_id):
+        key = session_id(client_id)
+        now = time.monotonic()
+        with self.lock:
+            session = self.sessions.pop(key, None)
+            if session is None:
+                session = Session(key, self.budget, self.scene_ttl)
+            session.last_seen = now
+            self.sessions[key] = session
+            while self.sessions:
+                oldest = next(iter(self.sessions.values()))
+                if len(self.sessions) <= self.max_sessions and now - oldest.last_seen <= self.ttl:
+                    break
+                self.sessions.popitem(last=False)
+            return session
+
+    def __len__(self):
+        return len(self.sessions)
@@ -0,0 +1,56 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# A clause ends at sentence punctuation, or at a comma once it carries
+# enough words to be worth speaking on its own. Only once whitespace has
+# arrived after it: a token ending in "1." may be followed by "5 meters".
+SENTENCE_END = re.compile(r"[.!?;:](?=\s)")
+CLAUSE_END = re.compile(r",(?=\s)")
+MIN_CLAUSE_WORDS = 4
+
+
+def iter_sse_content(response):
+    # Yield the content deltas of an OpenAI-compatible "stream": true response
+    for line in response.iter_lines():
+        if not line:
+            continue
+        line = line.decode("utf-8")
+        if not line.startswith("data: "):
+            continue
+        data = line[6:].strip()
+        if data == "[DONE]":
+            break
+        data = json.loads(data)
+        if "choices" in data and len(data["choices"]) > 0:
+            delta = data["choices"][0].get("delta", {})
+            content = delta.get("content", "")
+            if content:
+                yield content
+
+
+def _split_clause(buffer):
+    match = SENTENCE_END.search(buffer)
+    if match:
+        return buffer[: match.end()], buffer[match.end() :]
+    for match in CLAUSE_END.finditer(buffer):
+        if len(buffer[: match.start()].split()) >= MIN_CLAUSE_WORDS:
+            return buffer[: match.end()], buffer[match.end() :]
+    return None, buffer
+
+
+def iter_clauses(chunks):
+    # Regroup token chunks into speakable clauses, as soon as each one
+    # completes; trailing punctuation waits for the next chunk or the end
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        clause, buffer = _split_clause(buffer)
+        while clause is not None:
+            if clause.strip():
+                yield clause.strip()
+            clause, buffer = _split_clause(buffer)
+    if buffer.strip():
+        yield buffer.strip()
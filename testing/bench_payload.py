@@ -0,0 +1,102 @@
+# Memory of one vision request body: the old path (base64 str, data URL
+# f-string, json.dumps, encode) against payloads.JsonBody streaming the
+# base64 while the body is sent. Measured with tracemalloc.
+#
+# usage: python testing/bench_payload.py [image.jpg]
+# Without an image a synthetic 512x512 JPEG (a resized frame) is used.
+
+import base64
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import payloads
+
+
+def synthetic_frame(size=(512, 512)):
+    from PIL import Image
+
+    image = Image.effect_mandelbrot(size, (-2.0, -1.25, 1.0, 1.25), 100).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+def vision_payload(url):
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "Describe this image concisely for a blind person."},
+                    {"type": "image_url", "image_url": {"url": url, "detail": "low"}},
+                ],
+            }
+        ],
+    }
+
+
+def send(chunks, probe=None):
+    # Stands in for the socket: looks at every chunk, keeps none
+    sent = 0
+    for chunk in chunks:
+        sent += len(chunk)
+        if probe is not None:
+            probe()
+    return sent
+
+
+def old_body(image_bytes, probe=None):
+    base64_image = base64.b64encode(image_bytes).decode("utf-8")
+    payload = vision_payload(f"data:image/jpeg;base64,{base64_image}")
+    data = json.dumps(payload).encode("utf-8")
+    return send([data], probe)
+
+
+def streamed_body(image_bytes, probe=None):
+    body = payloads.JsonBody(vision_payload(payloads.ImageData(image_bytes)))
+    return send(body, probe)
+
+
+def measure(name, fn, image_bytes):
+    fn(image_bytes)  # warm up (imports, caches)
+    # Allocations of 1 KB and more alive while a chunk is being sent, the
+    # most seen at once (the frame itself was allocated before tracing)
+    most = [0, 0]
+
+    def probe():
+        traces = [trace for trace in tracemalloc.take_snapshot().traces if trace.size >= 1024]
+        if len(traces) > most[0]:
+            most[:] = [len(traces), sum(trace.size for trace in traces)]
+
+    tracemalloc.start()
+    fn(image_bytes, probe)
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    sent = fn(image_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<18} sent {sent:>7} bytes   peak {peak / 1024:7.1f} KB "
+        f"({peak / len(image_bytes):.2f}x the image)   "
+        f"{most[0]} allocations >= 1 KB alive ({most[1] / 1024:.1f} KB)"
+    )
+    return peak
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as image_file:
+            image_bytes = image_file.read()
+    else:
+        image_bytes = synthetic_frame()
+    print(f"Image: {len(image_bytes) / 1024:.0f} KB")
+
+    old_peak = measure("old (json.dumps)", old_body, image_bytes)
+    new_peak = measure("streamed", streamed_body, image_bytes)
+    print(f"peak memory per request: {old_peak / new_peak:.1f}x lower")
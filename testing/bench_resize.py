@@ -0,0 +1,92 @@
+# Benchmark the in-memory resize/encode path against the old ImageMagick
+# subprocess + disk round trip.
+#
+# usage: python testing/bench_resize.py [image.jpg] [iterations]
+# Without an image a synthetic 4000x3000 JPEG (typical phone photo) is used.
+
+import base64
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imaging
+
+
+def synthetic_photo(size=(4000, 3000)):
+    from PIL import Image
+
+    image = Image.effect_mandelbrot(size, (-2.0, -1.25, 1.0, 1.25), 100).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92)
+    return output.getvalue()
+
+
+def magick_disk_roundtrip(image_path, workdir, target_size="512x512"):
+    # What resize_and_encode_image used to do on every capture
+    resized_path = os.path.join(workdir, "resized_bench.jpg")
+    subprocess.run(
+        [
+            "magick",
+            "convert",
+            image_path,
+            "-resize",
+            target_size + "^",
+            "-gravity",
+            "center",
+            "-extent",
+            target_size,
+            resized_path,
+        ],
+        check=True,
+    )
+    with open(resized_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+def in_memory(image_path, resize):
+    with open(image_path, "rb") as image_file:
+        return base64.b64encode(resize(image_file.read())).decode("utf-8")
+
+
+def run(name, fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{name:<28} mean {statistics.mean(timings):8.1f} ms   "
+        f"p50 {statistics.median(timings):8.1f} ms   max {max(timings):8.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    workdir = tempfile.mkdtemp()
+    try:
+        if len(sys.argv) > 1:
+            image_path = sys.argv[1]
+        else:
+            image_path = os.path.join(workdir, "bench.jpg")
+            with open(image_path, "wb") as image_file:
+                image_file.write(synthetic_photo())
+        print(f"Image: {image_path} ({os.path.getsize(image_path) / 1024:.0f} KB), {iterations} iterations")
+
+        if imaging.pillow_available():
+            run("pillow (in memory)", lambda: in_memory(image_path, imaging.resize_with_pillow), iterations)
+        else:
+            print("pillow (in memory)           skipped, Pillow not installed")
+
+        if shutil.which("magick"):
+            run("magick (pipes)", lambda: in_memory(image_path, imaging.resize_with_magick), iterations)
+            run("magick (fork + disk)", lambda: magick_disk_roundtrip(image_path, workdir), iterations)
+        else:
+            print("magick                       skipped, ImageMagick not installed")
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,53 @@
+# Clause splitting of streamed answers (streaming.iter_clauses): token
+# chunks as an SSE stream delivers them, including decimals split across
+# chunks, which must never be spoken as two clauses. Prints each check and
+# exits non-zero if one fails.
+#
+# usage: python testing/check_clauses.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import streaming
+
+CASES = [
+    # (chunks, clauses expected)
+    (["Chair", " 1", ".", "5", " meters ahead."], ["Chair 1.5 meters ahead."]),
+    (["Caution: step down 0", ".", "5 m ahead"], ["Caution:", "step down 0.5 m ahead"]),
+    (["Step 0.", "5 m ahead. ", "Person 2", ".5 m left."], ["Step 0.5 m ahead.", "Person 2.5 m left."]),
+    (["Bench 1", ".", "2 m ahead."], ["Bench 1.2 m ahead."]),
+    (["Door ahead.", " Car", " 3", ".", "0 m right."], ["Door ahead.", "Car 3.0 m right."]),
+    (["Pole ahead", "."], ["Pole ahead."]),
+    (["A person at 2 meters on your left, a bike", " behind them."], ["A person at 2 meters on your left,", "a bike behind them."]),
+    (["Stop! ", "Stairs 1", ",5 m down."], ["Stop!", "Stairs 1,5 m down."]),
+]
+
+
+def incremental(chunks):
+    # Clauses with the number of chunks received when each came out, to check
+    # a clause is spoken as soon as it is complete
+    received = 0
+
+    def feed():
+        nonlocal received
+        for chunk in chunks:
+            received += 1
+            yield chunk
+
+    return [(clause, received) for clause in streaming.iter_clauses(feed())]
+
+
+if __name__ == "__main__":
+    failures = 0
+    for chunks, expected in CASES:
+        clauses = list(streaming.iter_clauses(chunks))
+        ok = clauses == expected
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {chunks!r} -> {clauses!r}")
+    # The first clause must not wait for the end of the stream
+    timing = incremental(["Door ahead.", " Car", " 3", ".", "0 m right."])
+    ok = timing[0] == ("Door ahead.", 2)
+    failures += not ok
+    print(f"{'PASS' if ok else 'FAIL'}  first clause out after {timing[0][1]} of 5 chunks")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,45 @@
+# Near-duplicate matching of the instruction cache: a reworded description
+# reuses cached instructions, a changed distance never does, even when the
+# rest of a long description is identical. Prints each check and exits
+# non-zero if one fails.
+#
+# usage: python testing/check_instruction_cache.py
+
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import instruction_cache
+
+DESCRIPTION = (
+    "A sidewalk with a parked car on the right and a person about {distance} meters ahead, "
+    "shops with awnings on the left, a bench near the curb, a busy street with traffic "
+    "and a crosswalk further ahead"
+)
+CACHED = "Person 5 m ahead."
+
+CASES = [
+    # (what changed, description looked up, instructions expected)
+    ("nothing", DESCRIPTION.format(distance="5"), CACHED),
+    ("one word", DESCRIPTION.format(distance="5").replace("busy", "crowded"), CACHED),
+    ("5 -> 4.5 m, same bucket", DESCRIPTION.format(distance="4.5"), CACHED),
+    ("5 -> 0.5 m", DESCRIPTION.format(distance="0.5"), None),
+    ("5 -> 2 m", DESCRIPTION.format(distance="2"), None),
+    ("a new hazard", DESCRIPTION.format(distance="5") + ", a step down 1 meter ahead", None),
+]
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    failures = 0
+    cache = instruction_cache.InstructionCache()
+    cache.store(DESCRIPTION.format(distance="5"), CACHED)
+    stored = instruction_cache.normalize(DESCRIPTION.format(distance="5"))
+    for change, description, expected in CASES:
+        answer = cache.lookup(description)
+        score = instruction_cache.similarity(stored, instruction_cache.normalize(description))
+        ok = answer == expected
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {change:<24} similarity {score:.2f} -> {answer!r}")
+    sys.exit(1 if failures else 0)
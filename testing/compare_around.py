@@ -0,0 +1,118 @@
+# "Around me" from a burst of frames taken while turning: one vision call
+# per distinct view (the single-frame pipeline run for each) against one
+# call with all the views as separate images, and one with the views tiled
+# into a mosaic. Against local stub servers with injected delays; the burst
+# is cut from a synthetic panorama, with pauses (near-identical frames) in
+# the turn.
+#
+# usage: python testing/compare_around.py [vision_delay] [falcon_delay]
+
+import io
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_server import StubServer
+
+vision_delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.8
+falcon_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.6
+
+# The stubs must be up before app is imported, it reads the URLs at import
+openai_stub = StubServer(delay=vision_delay, name="openai").start()
+falcon_stub = StubServer(delay=falcon_delay, name="falcon").start()
+os.environ.update(
+    OPENAI_API_KEY="stub",
+    AI71_API_KEY="stub",
+    OPENAI_API_URL=openai_stub.url,
+    FALCON_API_URL=falcon_stub.url,
+    SOCKETIO_ASYNC_MODE="threading",
+    INSTRUCTION_MODE="stateless",
+    ADAPTIVE_ENCODING="0",
+    SCENE_CHANGE_THRESHOLD="-1",
+    INSTRUCTION_CACHE_TTL="0",
+)
+
+import app
+import rate_limits
+from PIL import Image, ImageDraw
+
+# Left edge of each frame in the panorama: the user pauses, turns, pauses...
+OFFSETS = [0, 8, 16, 450, 462, 900, 905, 1350, 1360, 1800]
+VIEW = 600
+
+
+def burst():
+    # A street-like panorama: bright gradient and random blocks, fixed seed
+    rng = random.Random(1)
+    panorama = Image.linear_gradient("L").resize((2400, VIEW)).convert("RGB")
+    draw = ImageDraw.Draw(panorama)
+    for _ in range(120):
+        x, y = rng.randrange(2400), rng.randrange(VIEW)
+        width, height = rng.randrange(20, 200), rng.randrange(20, 300)
+        color = tuple(rng.randrange(40, 256) for _ in range(3))
+        shape = draw.rectangle if rng.random() < 0.6 else draw.ellipse
+        shape((x, y, x + width, y + height), fill=color, outline=(0, 0, 0))
+    frames = []
+    for offset in OFFSETS:
+        output = io.BytesIO()
+        panorama.crop((offset, 0, offset + VIEW, VIEW)).save(output, format="JPEG", quality=90)
+        frames.append(output.getvalue())
+    return frames
+
+
+def calls_since(stub, start):
+    return [payload for _, payload in stub.requests[start:]]
+
+
+def run(label, fn):
+    vision_start, falcon_start = len(openai_stub.requests), len(falcon_stub.requests)
+    started = time.perf_counter()
+    views = fn()
+    seconds = time.perf_counter() - started
+    vision_calls = calls_since(openai_stub, vision_start)
+    falcon_calls = calls_since(falcon_stub, falcon_start)
+    tokens = sum(rate_limits.estimate_tokens(payload) for payload in vision_calls + falcon_calls)
+    print(
+        f"{label:<10} {views} views   {seconds * 1000:6.0f} ms   vision calls {len(vision_calls)}   "
+        f"falcon calls {len(falcon_calls)}   tokens (estimated) {tokens}"
+    )
+    return seconds
+
+
+def per_view(frames):
+    # What answering "around me" took before: the same distinct views, one
+    # capture each through the single-frame pipeline
+    views = app.collect_views(new_frame(), frames)
+    for view in views:
+        result = app.process_frame(new_frame(), view, speak=False)
+        assert "description" in result, result
+    return len(views)
+
+
+def combined(frames, layout):
+    app.AROUND_LAYOUT = layout
+    result = app.process_around(new_frame(), frames, speak=False)
+    assert "description" in result, result
+    return result["views"]
+
+
+def new_frame():
+    return app.new_frame(app.client_sessions.get("bench"))
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    frames = burst()
+    print(
+        f"{len(frames)} frames in the burst, vision delay {vision_delay}s, falcon delay {falcon_delay}s "
+        f"(views: dHash more than {app.AROUND_MIN_DISTANCE} bits apart, at most {app.AROUND_MAX_VIEWS})"
+    )
+    separate = run("per view", lambda: per_view(frames))
+    images = run("images", lambda: combined(frames, "images"))
+    mosaic = run("mosaic", lambda: combined(frames, "mosaic"))
+    print(f"one combined call: {separate / images:.1f}x faster than a call per view")
+    openai_stub.stop()
+    falcon_stub.stop()
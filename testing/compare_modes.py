@@ -0,0 +1,144 @@
+# Per-frame latency of the two-hop (OpenAI description + Falcon
+# instructions) and single-hop (one structured OpenAI call) pipeline modes,
+# against local stub servers with injected delays. Then the stateless and
+# delta instruction modes on a scripted walk: Falcon calls, tokens, latency
+# and words spoken per frame.
+#
+# usage: python testing/compare_modes.py [frames] [vision_delay] [falcon_delay]
+
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_server import INSTRUCTIONS, StubServer
+
+frames = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+vision_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+falcon_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.6
+
+# The stubs must be up before app is imported, it reads the URLs at import
+openai_stub = StubServer(delay=vision_delay, name="openai").start()
+
+
+def falcon_answer(payload):
+    # A delta request only gets a warning when something near changed
+    prompt = payload["messages"][-1]["content"]
+    if "NOTHING NEW" in prompt:
+        changes = prompt.split("Changed:")[1].split("\n")[0]
+        if not any(word in changes for word in ("chair", "person", "step")):
+            return "NOTHING NEW"
+    return INSTRUCTIONS
+
+
+falcon_stub = StubServer(delay=falcon_delay, name="falcon", answer=falcon_answer).start()
+os.environ["OPENAI_API_URL"] = openai_stub.url
+os.environ["FALCON_API_URL"] = falcon_stub.url
+os.environ["SOCKETIO_ASYNC_MODE"] = "threading"
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("AI71_API_KEY", "stub")
+
+import app
+import payloads
+from instruction_cache import InstructionCache
+from scene_cache import SceneCache
+from scene_state import SceneState
+
+# Descriptions of consecutive frames while walking down a hallway
+HALLWAY = "A long indoor hallway with white walls and a tiled floor. Ceiling lights are on."
+WALK = [
+    f"{HALLWAY} A wooden chair stands 2 meters ahead on the left. A closed door at the end.",
+    f"{HALLWAY} A wooden chair stands 2 meters ahead on the left. A closed door at the end.",
+    f"{HALLWAY} A wooden chair stands 1.5 meters ahead on the left. A closed door at the end.",
+    f"{HALLWAY} A wooden chair stands 1.5 meters ahead on the left. A closed door at the end.",
+    f"{HALLWAY} A person walks towards you 3 meters away. A closed door at the end.",
+    f"{HALLWAY} A person walks towards you 3 meters away. A closed door at the end.",
+    f"{HALLWAY} A closed door at the end, a notice board next to it.",
+    f"{HALLWAY} A closed door at the end. A step down in front of the door.",
+]
+
+# Seconds per spoken word, as testing/fake_tts.py
+SECONDS_PER_WORD = 0.3
+
+
+def test_frame():
+    from PIL import Image
+
+    image = Image.effect_noise((512, 512), 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG")
+    return payloads.ImageData(output.getvalue())
+
+
+def run_mode(mode, image_data):
+    app.PIPELINE_MODE = mode
+    # Every frame must reach the network
+    app.scene_cache = SceneCache(threshold=-1)
+    app.instruction_cache = InstructionCache(ttl=0)
+    timings = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        scene, error = app.describe_scene(image_data, "compare.jpg", None)
+        if error:
+            raise RuntimeError(error)
+        if scene["instructions"] is None:
+            scene["instructions"] = app.generate_instructions(scene["description"])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(mode, timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{mode:<11} mean {statistics.mean(timings) * 1000:7.0f} ms   "
+        f"p50 {statistics.median(timings) * 1000:7.0f} ms   p95 {p95 * 1000:7.0f} ms"
+    )
+
+
+def run_instruction_mode(state):
+    app.instruction_cache = InstructionCache(ttl=0)
+    first_request = len(falcon_stub.requests)
+    timings = []
+    words = 0
+    for description in WALK:
+        start = time.perf_counter()
+        instructions = app.generate_instructions(description, state=state)
+        timings.append(time.perf_counter() - start)
+        words += len(instructions.split())
+    requests = [payload for _, payload in falcon_stub.requests[first_request:]]
+    # Same estimate as the stub's usage numbers
+    prompt_tokens = sum(len(json.dumps(payload["messages"])) // 4 for payload in requests)
+    completion_tokens = sum(len(falcon_answer(payload)) // 4 for payload in requests)
+    return timings, len(requests), prompt_tokens, completion_tokens, words
+
+
+def report_instruction_mode(mode, timings, calls, prompt_tokens, completion_tokens, words):
+    count = len(WALK)
+    print(
+        f"{mode:<11} falcon calls {calls}/{count}   tokens/frame {prompt_tokens / count:4.0f} prompt "
+        f"{completion_tokens / count:3.0f} completion   latency/frame {statistics.mean(timings) * 1000:5.0f} ms   "
+        f"speech/frame {words * SECONDS_PER_WORD / count:4.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    image_data = test_frame()
+    print(f"{frames} frames, vision delay {vision_delay}s, falcon delay {falcon_delay}s")
+    two_hop = run_mode("two_hop", image_data)
+    single_hop = run_mode("single_hop", image_data)
+    report("two_hop", two_hop)
+    report("single_hop", single_hop)
+    saved = statistics.mean(two_hop) - statistics.mean(single_hop)
+    print(f"single_hop saves {saved * 1000:.0f} ms per frame on average")
+
+    print(f"{len(WALK)} frames of a walk, falcon delay {falcon_delay}s")
+    report_instruction_mode("stateless", *run_instruction_mode(None))
+    report_instruction_mode("delta", *run_instruction_mode(SceneState()))
+    openai_stub.stop()
+    falcon_stub.stop()
@@ -0,0 +1,17 @@
+# Stand-in for termux-tts-speak: appends what would have been spoken, with
+# start and end timestamps, to a log file and takes about as long as real
+# speech (0.3 s per word).
+#
+# usage: TTS_COMMAND="python testing/fake_tts.py /tmp/spoken.log" python app.py
+
+import sys
+import time
+
+SECONDS_PER_WORD = 0.3
+
+if __name__ == "__main__":
+    log_path, text = sys.argv[1], " ".join(sys.argv[2:])
+    started = time.time()
+    time.sleep(SECONDS_PER_WORD * len(text.split()))
+    with open(log_path, "a") as log:
+        log.write(f"{started:.3f}\t{time.time():.3f}\t{text}\n")
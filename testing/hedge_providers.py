@@ -0,0 +1,108 @@
+# Tail latency with and without hedged requests, against two local stub
+# providers: a primary that is usually fast but sometimes stalls, and a
+# steady backup. Then a pool whose first provider is a dead endpoint
+# (nothing listens on port 9): every call must still be answered.
+#
+# usage: python testing/hedge_providers.py [calls] [stall_every] [stall_delay]
+
+import logging
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_server import StubServer
+
+import http_clients
+import providers
+
+calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+stall_every = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+stall_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+PAYLOAD = {
+    "model": "stub",
+    "messages": [{"role": "user", "content": "Describe the obstacles."}],
+}
+
+
+def primary_delay(n):
+    return stall_delay if n % stall_every == 0 else 0.2
+
+
+def run(hedge_budget, primary_stub, backup_stub):
+    pool = providers.ProviderPool(
+        "bench",
+        [
+            providers.Provider("primary", http_clients.ApiClient("primary", primary_stub.url, {})),
+            providers.Provider("backup", http_clients.ApiClient("backup", backup_stub.url, {})),
+        ],
+        hedge_budget,
+    )
+    # Measure the primary first, so routing and the p90 start out informed
+    for provider in pool.providers:
+        for _ in range(pool.min_samples):
+            provider.post(PAYLOAD)
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        pool.post(PAYLOAD).raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return timings, pool
+
+
+def report(label, timings, pool):
+    ordered = sorted(timings)
+
+    def quantile(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    print(
+        f"{label:<12} p50 {quantile(0.5):6.0f} ms   p95 {quantile(0.95):6.0f} ms   "
+        f"p99 {quantile(0.99):6.0f} ms   hedges {pool.hedges}/{pool.calls}"
+    )
+
+
+def dead_provider(hedge_budget):
+    # (failed calls, failovers) of `calls` calls to a pool listing a dead
+    # endpoint before a healthy stub, nothing measured beforehand
+    stub = StubServer(delay=0.05, name="healthy").start()
+    pool = providers.ProviderPool(
+        "bench",
+        [
+            providers.Provider("dead", http_clients.ApiClient("dead", "http://127.0.0.1:9/v1/chat/completions", {}, retries=0)),
+            providers.Provider("healthy", http_clients.ApiClient("healthy", stub.url, {})),
+        ],
+        hedge_budget,
+    )
+    failed = 0
+    for _ in range(calls):
+        try:
+            if pool.post(PAYLOAD).status_code >= 400:
+                failed += 1
+        except requests.exceptions.RequestException:
+            failed += 1
+    stub.stop()
+    dead = pool.providers[0]
+    print(
+        f"dead first   budget {hedge_budget:<4} failed {failed}/{calls}   "
+        f"calls to the dead provider {len(dead.outcomes)}"
+    )
+    return failed
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    print(f"{calls} calls, primary stalls {stall_delay}s every {stall_every}, backup 0.4s")
+    for label, budget in (("no hedging", 0.0), ("hedged", 0.2)):
+        primary_stub = StubServer(delay=primary_delay, name="primary").start()
+        backup_stub = StubServer(delay=0.4, name="backup").start()
+        timings, pool = run(budget, primary_stub, backup_stub)
+        report(label, timings, pool)
+        primary_stub.stop()
+        backup_stub.stop()
+    failed = sum(dead_provider(budget) for budget in (0.0, 0.2))
+    if failed:
+        sys.exit(1)
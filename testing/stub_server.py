@@ -0,0 +1,197 @@
+# Local OpenAI-compatible chat-completions stub for the testing harnesses.
+# Answers vision requests with a description, structured (json_object)
+# requests with description + instructions, text requests with
+# instructions, and supports "stream": true. Delays and error statuses can
+# be injected, and an OpenAI-like request rate limit enforced.
+#
+# usage: python testing/stub_server.py [port] [delay_seconds]
+
+import json
+import math
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DESCRIPTION = (
+    "A narrow hallway with a wooden chair about 1.5 meters ahead on the left, "
+    "a person standing near a door 3 meters away, and a step down at the end."
+)
+INSTRUCTIONS = "Chair 1.5 meters ahead. Person 3 meters away. Step down ahead."
+
+
+def _has_image(payload):
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            if any(part.get("type") == "image_url" for part in content):
+                return True
+    return False
+
+
+def _answer(payload):
+    if payload.get("response_format", {}).get("type") == "json_object":
+        return json.dumps({"description": DESCRIPTION, "instructions": INSTRUCTIONS})
+    if _has_image(payload):
+        return DESCRIPTION
+    return INSTRUCTIONS
+
+
+class StubServer:
+    # delay: seconds (or callable(request_number) -> seconds) before answering
+    # token_delay: seconds between streamed chunks
+    # statuses: list of (status, headers) returned for the first requests,
+    #           e.g. [(429, {"Retry-After": "1"})]
+    # answer: callable(payload) -> answer text, instead of the canned ones
+    # rate_limit: (requests per minute, burst) enforced with a token bucket,
+    #             reported in x-ratelimit-* headers; requests over it get a
+    #             429 with Retry-After
+
+    def __init__(
+        self, port=0, delay=0.0, token_delay=0.0, statuses=None, name="stub", answer=None, rate_limit=None
+    ):
+        self.delay = delay
+        self.answer = answer or _answer
+        self.token_delay = token_delay
+        self.statuses = list(statuses or [])
+        self.name = name
+        self.requests = []  # (monotonic arrival time, payload)
+        self.rate_limit = rate_limit
+        self.allowance = rate_limit[1] if rate_limit else None
+        self.allowance_at = time.monotonic()
+        self.throttled = 0  # 429s sent for the rate limit
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1/chat/completions"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _take(self):
+        # (allowed, rate-limit headers), called with the lock held
+        per_minute, burst = self.rate_limit
+        rate = per_minute / 60
+        now = time.monotonic()
+        self.allowance = min(burst, self.allowance + (now - self.allowance_at) * rate)
+        self.allowance_at = now
+        allowed = self.allowance >= 1
+        if allowed:
+            self.allowance -= 1
+        else:
+            self.throttled += 1
+        headers = {
+            "x-ratelimit-limit-requests": str(per_minute),
+            "x-ratelimit-remaining-requests": str(int(self.allowance)),
+            "x-ratelimit-reset-requests": f"{int((burst - self.allowance) / rate * 1000)}ms",
+        }
+        if not allowed:
+            wait = (1 - self.allowance) / rate
+            headers["Retry-After"] = str(math.ceil(wait))
+            headers["retry-after-ms"] = str(int(wait * 1000) + 1)
+        return allowed, headers
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self.send_response(405)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _send(self, status, body, headers=None, content_type="application/json"):
+                body = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.requests.append((time.monotonic(), payload))
+                    number = len(stub.requests)
+                    injected = stub.statuses.pop(0) if stub.statuses else None
+                    limited = stub._take() if stub.rate_limit and injected is None else None
+                if limited is not None and not limited[0]:
+                    error = {"error": {"message": f"{stub.name}: rate limit reached"}}
+                    self._send(429, json.dumps(error), limited[1])
+                    return
+
+                delay = stub.delay(number) if callable(stub.delay) else stub.delay
+                if delay:
+                    time.sleep(delay)
+
+                if injected is not None:
+                    status, headers = injected
+                    error = {"error": {"message": f"{stub.name}: injected {status}"}}
+                    self._send(status, json.dumps(error), headers)
+                    return
+
+                content = stub.answer(payload)
+                usage = {
+                    "prompt_tokens": len(json.dumps(payload.get("messages", []))) // 4,
+                    "completion_tokens": len(content) // 4,
+                }
+                if payload.get("stream"):
+                    self._stream(content)
+                    return
+                body = {
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                }
+                # Like OpenAI, so the client can tell upload time from inference
+                headers = {"openai-processing-ms": str(int(delay * 1000))}
+                if limited is not None:
+                    headers.update(limited[1])
+                self._send(200, json.dumps(body), headers)
+
+            def _stream(self, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = content.split(" ")
+                events = [
+                    {"choices": [{"delta": {"content": word + (" " if i < len(words) - 1 else "")}}]}
+                    for i, word in enumerate(words)
+                ]
+                for data in events + ["[DONE]"]:
+                    line = data if isinstance(data, str) else json.dumps(data)
+                    chunk = f"data: {line}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                    if stub.token_delay:
+                        time.sleep(stub.token_delay)
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    stub = StubServer(port=port, delay=delay).start()
+    print(f"Stub chat-completions server on {stub.url} (delay {delay}s)")
+    try:
+        stub.thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
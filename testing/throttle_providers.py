@@ -0,0 +1,199 @@
+# Provider rate limiting against local stub servers that answer 429s:
+# concurrent calls without a limiter (every 429 is a failed capture), with
+# the budget learned from the x-ratelimit-* headers, and configured; then
+# a Retry-After holding back every thread, a token budget, and a call
+# refused up front when the wait would outlast its deadline. Prints each
+# check and exits non-zero if one fails.
+#
+# usage: python testing/throttle_providers.py [threads] [calls_per_thread] [requests_per_minute]
+
+import logging
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_server import StubServer
+
+import deadlines
+import http_clients
+import payloads
+import rate_limits
+
+threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+calls_per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+requests_per_minute = float(sys.argv[3]) if len(sys.argv) > 3 else 600
+# The stub's burst, one second of its rate like the limiter's
+BURST = 10
+
+PAYLOAD = {
+    "model": "stub",
+    "messages": [{"role": "user", "content": "Describe the obstacles."}],
+    "max_tokens": 50,
+}
+
+failures = []
+
+
+def check(name, ok, detail):
+    print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+
+def unlimited_call(session, url):
+    # What a capture did before: one post, a 429 is an error
+    response = session.post(url, data=payloads.JsonBody(PAYLOAD), timeout=(3.05, 30))
+    response.close()
+    return response.status_code < 400
+
+
+def limited_call(client):
+    try:
+        response = client.post(PAYLOAD)
+    except rate_limits.RateLimited:
+        return False
+    response.close()
+    return response.status_code < 400
+
+
+def without_limiter(url):
+    session = http_clients.create_session()
+    return lambda: unlimited_call(session, url)
+
+
+def learned_limit(url):
+    client = http_clients.ApiClient("stub", url, {})
+    return lambda: limited_call(client)
+
+
+def configured_limit(url):
+    client = http_clients.ApiClient("stub", url, {}, requests_per_minute=requests_per_minute)
+    return lambda: limited_call(client)
+
+
+def hammer(call):
+    # threads x calls_per_thread calls at once: (succeeded, failed, seconds)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(calls_per_thread):
+            ok = call()
+            with lock:
+                results.append(ok)
+
+    start = time.monotonic()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results.count(True), results.count(False), time.monotonic() - start
+
+
+def concurrency():
+    total = threads * calls_per_thread
+    minimum = (total - BURST) / (requests_per_minute / 60)
+    print(
+        f"{threads} threads x {calls_per_thread} calls, stub allows {requests_per_minute:g}/min "
+        f"(burst {BURST}): at least {minimum:.1f}s for all of them"
+    )
+    runs = (("no limiter", without_limiter), ("learned", learned_limit), ("configured", configured_limit))
+    baseline = None
+    for label, make_call in runs:
+        stub = StubServer(name=label, rate_limit=(requests_per_minute, BURST)).start()
+        succeeded, failed, seconds = hammer(make_call(stub.url))
+        stub.stop()
+        print(
+            f"  {label:<11} {succeeded:>3} ok  {failed:>3} failed  "
+            f"{stub.throttled:>3} 429s from the stub  {seconds:5.1f}s"
+        )
+        if baseline is None:
+            baseline = stub.throttled
+            check("429s without a limiter", failed > 0, f"{failed} of {total} captures lost")
+            continue
+        check(f"{label}: every call answered", failed == 0, f"{succeeded}/{total}")
+        # A few can still slip through when arrivals bunch up at the stub
+        check(
+            f"{label}: 429s avoided",
+            stub.throttled <= baseline / 5,
+            f"{stub.throttled} 429s, {baseline} without a limiter",
+        )
+
+
+def retry_after():
+    # One 429 with Retry-After: 1 holds back every thread, not only the one
+    # that got it
+    stub = StubServer(name="retry-after", statuses=[(429, {"Retry-After": "1"})]).start()
+    client = http_clients.ApiClient("stub", stub.url, {})
+    start = time.monotonic()
+    first = threading.Thread(target=limited_call, args=(client,))
+    first.start()
+    time.sleep(0.1)
+    succeeded, failed, _ = hammer(lambda: limited_call(client))
+    first.join()
+    stub.stop()
+    arrivals = sorted(arrived - start for arrived, _ in stub.requests)
+    held = arrivals[1] if len(arrivals) > 1 else 0.0
+    check(
+        "Retry-After holds every thread",
+        failed == 0 and held >= 0.95,
+        f"second request {held:.2f}s after the start, {succeeded} ok, {failed} failed",
+    )
+
+
+def token_budget():
+    # 6000 tokens/min = 100/s for calls estimated at ~55 tokens each
+    stub = StubServer(name="tokens").start()
+    client = http_clients.ApiClient("stub", stub.url, {}, tokens_per_minute=6000)
+    tokens = rate_limits.estimate_tokens(PAYLOAD)
+    calls = 12
+    start = time.monotonic()
+    for _ in range(calls):
+        limited_call(client)
+    seconds = time.monotonic() - start
+    stub.stop()
+    expected = (calls * tokens - 100) / 100
+    check(
+        "token budget paces calls",
+        seconds >= expected * 0.9,
+        f"{calls} calls of ~{tokens} tokens in {seconds:.2f}s (the budget needs {expected:.2f}s at least)",
+    )
+
+
+def refused():
+    # A wait longer than max_rate_wait, or the frame's deadline, is refused
+    # without a call
+    stub = StubServer(name="refused", statuses=[(429, {"Retry-After": "5"})]).start()
+    client = http_clients.ApiClient("stub", stub.url, {}, max_rate_wait=2.0)
+    check("refused past max_rate_wait", not limited_call(client), "429 with Retry-After: 5")
+    sent = len(stub.requests)
+    deadline = deadlines.Deadline(0.5)
+    start = time.monotonic()
+    try:
+        client.post(PAYLOAD, deadline=deadline)
+        outcome = "answered"
+    except rate_limits.RateLimited as e:
+        outcome = str(e)
+    except (deadlines.DeadlineExceeded, requests.exceptions.RequestException) as e:
+        outcome = f"other error: {e}"
+    seconds = time.monotonic() - start
+    stub.stop()
+    check(
+        "refused past the deadline",
+        outcome.endswith("rate limited") and seconds < 0.1 and len(stub.requests) == sent,
+        f"{outcome!r} after {seconds * 1000:.0f} ms, {len(stub.requests) - sent} requests sent",
+    )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    concurrency()
+    retry_after()
+    token_budget()
+    refused()
+    sys.exit(1 if failures else 0)
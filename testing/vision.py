@@ -1,12 +1,20 @@
 import os
 import requests
-import json
-import base64
 import logging
+import shlex
 import subprocess
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 import imghdr
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imaging
+import location
+import multiview
+import payloads
+import voice_commands
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -36,6 +44,38 @@ FALCON_HEADERS = {
     "Authorization": f"Bearer {AI71_API_KEY}"
 }
 
+# Voice interface: speech-to-text and text-to-speech commands
+STT_COMMAND = shlex.split(os.getenv("STT_COMMAND", "termux-speech-to-text"))
+TTS_COMMAND = shlex.split(os.getenv("TTS_COMMAND", "termux-tts-speak"))
+
+# Built once, matching a transcript is then a few dozen microseconds
+command_matcher = voice_commands.CommandMatcher()
+
+# "What's around me": up to AROUND_SHOTS photos taken back to back while
+# the user turns, the distinct ones (dHash more than AROUND_MIN_DISTANCE
+# bits apart, at most AROUND_MAX_VIEWS) described in one request
+AROUND_SHOTS = int(os.getenv("AROUND_SHOTS", "6"))
+AROUND_MAX_VIEWS = int(os.getenv("AROUND_MAX_VIEWS", "4"))
+AROUND_MIN_DISTANCE = int(os.getenv("AROUND_MIN_DISTANCE", "16"))
+
+# Location: "termux" or a recorded track (JSON lines, see location.py),
+# refreshed every LOCATION_INTERVAL seconds in the background; "where am I"
+# answers from cache when the fix is at most LOCATION_MAX_AGE seconds old,
+# else asks the LOCATION_FALLBACKS providers in turn for a fresh one
+LOCATION_SOURCE = os.getenv("LOCATION_SOURCE", "termux")
+LOCATION_PROVIDER = os.getenv("LOCATION_PROVIDER", "passive")
+LOCATION_FALLBACKS = [
+    provider for provider in os.getenv("LOCATION_FALLBACKS", "network,gps").split(",") if provider
+]
+LOCATION_INTERVAL = float(os.getenv("LOCATION_INTERVAL", "30"))
+LOCATION_MAX_AGE = float(os.getenv("LOCATION_MAX_AGE", "60"))
+
+if LOCATION_SOURCE == "termux":
+    location_source = location.TermuxLocation(LOCATION_PROVIDER, LOCATION_FALLBACKS)
+else:
+    location_source = location.ReplayedTrack(LOCATION_SOURCE)
+location_service = location.LocationService(location_source, LOCATION_INTERVAL).start()
+
 def take_photo(camera_id=1, filename='visionAId.jpg', filepath='~/storage/dcim/', resolution='800x600'):
     _path = os.path.join(filepath, filename)
     _path = os.path.expanduser(_path)  # Expand the ~ in the filepath
@@ -68,24 +108,21 @@ def check_image_format(file_path):
 def resize_and_encode_image(image_path, target_size="512x512"):
     resized_path = image_path.replace('.jpg', '_resized.jpg')
     try:
-        # Resize image using ImageMagick's magick convert command
-        subprocess.run(['magick', 'convert', image_path, '-resize', target_size+'^', '-gravity', 'center', '-extent', target_size, resized_path], check=True)
+        # Resize in memory (Pillow, ImageMagick as fallback)
+        with open(image_path, "rb") as image_file:
+            resized_bytes = imaging.resize_image(image_file.read(), target_size)
+        with open(resized_path, "wb") as image_file:
+            image_file.write(resized_bytes)
         logger.info(f"Image resized and saved to {resized_path}")
         
-        # Check the size of the resized image
-        result = subprocess.run(['magick', 'identify', '-format', '%wx%h', resized_path], capture_output=True, text=True)
-        resized_dimensions = result.stdout.strip()
-        logger.info(f"Resized image dimensions: {resized_dimensions}")
-        
         # Check file size of resized image
         resized_size_mb = check_file_size(resized_path)
         logger.info(f"Resized image file size: {resized_size_mb:.2f} MB")
         
-        # Read and encode the resized image
-        with open(resized_path, "rb") as image_file:
-            encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
-        logger.info(f"Image encoded successfully. Encoded length: {len(encoded_image)}")
-        return encoded_image
+        # Base64-encoded while the request is sent
+        image_data = payloads.ImageData(resized_bytes)
+        logger.info(f"Image encoded successfully. Encoded length: {len(image_data)}")
+        return image_data
     except subprocess.CalledProcessError as e:
         logger.error(f"Error resizing image: {e}")
         return None
@@ -96,8 +133,8 @@ def resize_and_encode_image(image_path, target_size="512x512"):
 def generate_image_description(image_path):
     logger.info("OpenAI: Generating image description")
     
-    base64_image = resize_and_encode_image(image_path)
-    if not base64_image:
+    image_data = resize_and_encode_image(image_path)
+    if not image_data:
         logger.error("Failed to resize and encode image")
         return "I'm sorry, I couldn't process the image at this time."
     
@@ -114,7 +151,7 @@ def generate_image_description(image_path):
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}",
+                            "url": image_data,
                             "detail": "low"
                         }
                     }
@@ -123,10 +160,11 @@ def generate_image_description(image_path):
         ]
     }
     
-    logger.info(f"Sending request to OpenAI API. Payload size: {len(json.dumps(payload))} bytes")
+    body = payloads.JsonBody(payload)
+    logger.info(f"Sending request to OpenAI API. Payload size: {len(body)} bytes")
     
     try:
-        response = requests.post(OPENAI_API_URL, headers=OPENAI_HEADERS, json=payload)
+        response = requests.post(OPENAI_API_URL, headers=OPENAI_HEADERS, data=body)
         response.raise_for_status()
         description = response.json()['choices'][0]['message']['content']
         logger.info(f"OpenAI: Generated description: {description[:100]}...")
@@ -181,12 +219,125 @@ def process_image():
         instructions = generate_instructions(image_description)
         logger.info(f"Full image description: {image_description}")
         logger.info(f"Full instructions: {instructions}")
-        return {"description": image_description, "instructions": instructions}
+        # Last known position, whatever its age (the result says how old)
+        return {"description": image_description, "instructions": instructions,
+                "location": location_service.describe()}
     else:
         logger.error("Failed to take photo or photo file not found")
         return {"error": "Failed to take photo or photo file not found"}
 
-if __name__ == "__main__":
+def generate_around_description(views):
+    logger.info(f"OpenAI: Describing the surroundings from {len(views)} views")
+    content = [
+        {
+            "type": "text",
+            "text": f"These {len(views)} photos were taken in order while a blind person turned around in place; "
+                    "the first one is straight ahead. Describe their surroundings concisely: what is in each "
+                    "direction, obstacles and people, with distances in meters. Mention once something seen twice."
+        }
+    ]
+    for resized_bytes in views:
+        content.append({"type": "image_url", "image_url": {"url": payloads.ImageData(resized_bytes), "detail": "low"}})
+    payload = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}]}
+
+    try:
+        response = requests.post(OPENAI_API_URL, headers=OPENAI_HEADERS, data=payloads.JsonBody(payload))
+        response.raise_for_status()
+        description = response.json()['choices'][0]['message']['content']
+        logger.info(f"OpenAI: Generated description: {description[:100]}...")
+        return description
+    except requests.exceptions.RequestException as e:
+        logger.error(f"OpenAI: Error in API request: {e}")
+        if hasattr(e, 'response') and e.response is not None:
+            logger.error(f"OpenAI: Response content: {e.response.content}")
+        return "I'm sorry, I couldn't generate a description at this time."
+
+def process_around():
+    # Photos are resized and compared as they are taken, so once the user
+    # has turned around only one request is left
+    speak_text("Turn around slowly")
+    selector = multiview.ViewSelector(AROUND_MIN_DISTANCE, AROUND_MAX_VIEWS)
+    views = []
+    taken = 0
+    for shot in range(AROUND_SHOTS):
+        if selector.full:
+            break
+        taken += 1
+        image_path = take_photo(filename=f'visionAId_around{shot}.jpg')
+        if not image_path or not os.path.exists(image_path):
+            continue
+        # A bad photo costs one view, not the whole answer
+        try:
+            with open(image_path, "rb") as image_file:
+                resized_bytes = imaging.resize_image(image_file.read())
+            fingerprint = imaging.difference_hash(resized_bytes) if imaging.pillow_available() else None
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Around: Error resizing {image_path}: {e}")
+            continue
+        except Exception as e:
+            logger.error(f"Around: Skipping {image_path}: {e}")
+            continue
+        if selector.offer(fingerprint):
+            views.append(resized_bytes)
+    if not views:
+        logger.error("Failed to take photo or photo file not found")
+        return {"error": "Failed to take photo or photo file not found"}
+    logger.info(f"Around: {len(views)} distinct views out of {taken} photos")
+    image_description = generate_around_description(views)
+    instructions = generate_instructions(image_description)
+    return {"description": image_description, "instructions": instructions,
+            "views": len(views), "location": location_service.describe()}
+
+def get_location():
+    # Cached fix if fresh enough, else wait a little for a new one
+    fix = location_service.get(LOCATION_MAX_AGE)
+    return location_service.describe(fix) if fix else None
+
+def handle_command(match):
+    # What to say back for a recognized command (None: not understood)
+    if match is None:
+        return "Sorry, I could not understand. Please try again."
+    if match.command in ("front", "around"):
+        result = process_image() if match.command == "front" else process_around()
+        return result.get("instructions", result.get("error"))
+    if match.command == "where":
+        position = get_location()
+        if position is None:
+            return "Sorry, I could not get your location."
+        answer = f"You are at latitude {position['latitude']:.5f}, longitude {position['longitude']:.5f}"
+        if position["accuracy"]:
+            answer += f", within {position['accuracy']:.0f} meters"
+        return answer
+    if match.command == "help":
+        destination = match.slots["destination"]
+        return f"Setting up navigation to {destination}" if destination else "Where do you want to go?"
+    return "Setting up warning system"
+
+def speak_text(text):
+    try:
+        subprocess.run(TTS_COMMAND + [text], check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.error(f"Error speaking text: {e}")
+
+def speech_routine(transcripts):
+    # transcripts: (text, time heard) pairs, e.g. from a SpeechListener,
+    # which keeps listening while a command is handled and its answer spoken
+    speak_text("Listening...")
+    for transcript, heard_at in transcripts:
+        match = command_matcher.match(transcript)
+        logger.info(f"Voice command: '{transcript}' -> {match} "
+                    f"({(time.monotonic() - heard_at) * 1000:.2f} ms to dispatch)")
+        speak_text(handle_command(match))
+
+if __name__ == "__main__" and sys.argv[1:2] == ["listen"]:
+    # `listen`: voice commands from termux-speech-to-text, `listen -`: typed
+    # (or piped) transcripts, one per line
+    if sys.argv[2:3] == ["-"]:
+        transcripts = ((line.strip(), time.monotonic()) for line in sys.stdin if line.strip())
+    else:
+        transcripts = voice_commands.SpeechListener(STT_COMMAND).start()
+    speech_routine(transcripts)
+elif __name__ == "__main__":
     logger.info("Starting image processing")
     result = process_image()
     if "error" in result:
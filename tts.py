@@ -0,0 +1,130 @@
+import itertools
+import logging
+import queue
+import re
+import subprocess
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DANGER = 0
+ROUTINE = 1
+
+# Warnings that must not wait behind (or be cut off by) routine messages
+DANGER_WORDS = re.compile(
+    r"\b(danger\w*|warning|caution|careful|stop|watch out|car|cars|vehicle\w*|"
+    r"traffic|bike|bicycle|stairs?|steps?|hole|drop|edge|curb|kerb|fall\w*|fire|hot)\b",
+    re.IGNORECASE,
+)
+
+
+def classify(text):
+    return DANGER if DANGER_WORDS.search(text) else ROUTINE
+
+
+class Utterance:
+    def __init__(self, text, priority, captured_at, deadline=None, session=None):
+        self.text = text
+        self.priority = priority
+        self.captured_at = captured_at
+        self.deadline = deadline
+        self.session = session
+        self.queued_at = time.monotonic()
+
+
+class SpeechWorker:
+    # Speaks queued text on a dedicated thread so requests return as soon as
+    # the text is queued. Danger messages jump the queue and interrupt a
+    # routine message being spoken. An utterance is dropped before it is
+    # spoken when speech from a newer frame of the same session has been
+    # queued since, when its frame's deadline has passed, or when the frame
+    # is older than max_age.
+
+    def __init__(self, command=("termux-tts-speak",), max_age=10.0):
+        self.command = list(command)
+        self.max_age = max_age
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.newest_frames = {}  # session -> captured_at of its newest frame
+        self.current = None
+        self.current_priority = None
+        self.stats = {"queued": 0, "spoken": 0, "dropped": 0, "preempted": 0, "errors": 0}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="speech-worker", daemon=True)
+        self.thread.start()
+
+    def say(self, text, priority=None, captured_at=None, deadline=None, session=None):
+        if priority is None:
+            priority = classify(text)
+        if captured_at is None:
+            captured_at = deadline.started_at if deadline is not None else time.monotonic()
+        utterance = Utterance(text, priority, captured_at, deadline, session)
+        with self.lock:
+            self._forget_old_sessions()
+            self.newest_frames[session] = max(self.newest_frames.get(session, 0.0), captured_at)
+            self.stats["queued"] += 1
+            if (
+                priority == DANGER
+                and self.current is not None
+                and self.current_priority != DANGER
+                and self.current.poll() is None
+            ):
+                logger.info("Speech: Interrupting routine message for a warning")
+                self.current.terminate()
+                self.stats["preempted"] += 1
+        self.queue.put((priority, next(self.order), utterance))
+        return True
+
+    def _forget_old_sessions(self):
+        # A session whose newest frame is past max_age has nothing left to
+        # supersede
+        if not self.max_age:
+            return
+        cutoff = time.monotonic() - self.max_age
+        for session in [s for s, newest in self.newest_frames.items() if newest < cutoff]:
+            del self.newest_frames[session]
+
+    def _is_stale(self, utterance):
+        if utterance.captured_at < self.newest_frames.get(utterance.session, 0.0):
+            return "superseded by a newer frame"
+        if utterance.deadline is not None and utterance.deadline.expired:
+            return utterance.deadline.reason
+        if self.max_age and time.monotonic() - utterance.captured_at > self.max_age:
+            return "too old"
+        return None
+
+    def _run(self):
+        while True:
+            _, _, utterance = self.queue.get()
+            with self.lock:
+                stale = self._is_stale(utterance)
+                if stale:
+                    self.stats["dropped"] += 1
+                    logger.info(f"Speech: Dropped ({stale}): {utterance.text[:50]}")
+                    continue
+                try:
+                    self.current = subprocess.Popen(self.command + [utterance.text])
+                except OSError as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"Error speaking text: {e}")
+                    continue
+                self.current_priority = utterance.priority
+            started = time.monotonic()
+            metrics.observe(
+                "visionaid_stage_seconds", started - utterance.queued_at, stage="speech_queue"
+            )
+            returncode = self.current.wait()
+            metrics.observe("visionaid_stage_seconds", time.monotonic() - started, stage="speak")
+            with self.lock:
+                self.current = None
+                if returncode == 0:
+                    self.stats["spoken"] += 1
+                    logger.info(f"Text spoken successfully: {utterance.text[:50]}...")
+                elif returncode < 0:
+                    logger.info(f"Speech interrupted: {utterance.text[:50]}...")
+                else:
+                    self.stats["errors"] += 1
+                    logger.error(f"Error speaking text, exit code {returncode}")
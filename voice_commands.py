@@ -0,0 +1,138 @@
+import logging
+import queue
+import re
+import subprocess
+import threading
+import time
+from collections import Counter, namedtuple
+
+logger = logging.getLogger(__name__)
+
+Match = namedtuple("Match", ["command", "score", "slots"])
+
+# Spoken commands. A trailing {slot} captures whatever is said after the
+# fixed words ("help me go to the station" -> destination "the station").
+COMMANDS = {
+    "front": ["what's in front of me", "what is ahead"],
+    "around": ["what's around me", "look around"],
+    "where": ["where am i"],
+    "help": ["help me go {destination}", "take me to {destination}"],
+    "warn": ["warn me"],
+}
+
+# Transcripts spell these either way
+CONTRACTIONS = {"what's": "what is", "whats": "what is", "where's": "where is", "i'm": "i am"}
+NON_WORD = re.compile(r"[^a-z0-9' ]+")
+SLOT = re.compile(r"\{(\w+)\}\s*$")
+
+# Filler between the fixed words and a slot value
+SLOT_FILLER = ("to", "the way to")
+
+
+def normalize(text):
+    words = NON_WORD.sub(" ", text.lower()).split()
+    return " ".join(CONTRACTIONS.get(word, word).strip("'") for word in words)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CommandMatcher:
+    # Matches a speech transcript to a command. Everything about the phrases
+    # is computed once: they are normalized and their character trigrams put
+    # in an inverted index, so a transcript is scored against all phrases in
+    # one pass over its own trigrams (Dice similarity, 0-100) rather than
+    # phrase by phrase. Slot phrases are compared on their fixed words with
+    # as many leading words of the transcript; the rest is the slot value.
+
+    def __init__(self, commands=COMMANDS, threshold=60):
+        self.threshold = threshold
+        self.phrases = []  # (command, slot name or None, trigram count)
+        # Fixed word count of slot phrases (None: whole transcript) ->
+        # trigram -> phrase numbers
+        self.indexes = {}
+        for command, phrases in commands.items():
+            for phrase in phrases:
+                slot = SLOT.search(phrase)
+                fixed = normalize(SLOT.sub("", phrase))
+                length = len(fixed.split()) if slot else None
+                grams = trigrams(fixed)
+                number = len(self.phrases)
+                self.phrases.append((command, slot.group(1) if slot else None, len(grams)))
+                index = self.indexes.setdefault(length, {})
+                for gram in grams:
+                    index.setdefault(gram, []).append(number)
+
+    def match(self, transcript):
+        # Best command scoring at least `threshold`, or None
+        text = normalize(transcript)
+        if not text:
+            return None
+        words = text.split()
+        best = None
+        for length, index in self.indexes.items():
+            if length is not None and len(words) < length:
+                continue
+            spoken = text if length is None else " ".join(words[:length])
+            grams = trigrams(spoken)
+            shared = Counter(number for gram in grams for number in index.get(gram, ()))
+            for number, count in shared.items():
+                command, slot, size = self.phrases[number]
+                score = 200 * count / (len(grams) + size)
+                if score >= self.threshold and (best is None or score > best.score):
+                    slots = {slot: self._slot_value(words[length:])} if slot else {}
+                    best = Match(command, round(score), slots)
+        return best
+
+    @staticmethod
+    def _slot_value(words):
+        value = " ".join(words)
+        for filler in SLOT_FILLER:
+            if value.startswith(filler + " "):
+                value = value[len(filler) + 1:]
+        return value or None
+
+
+class SpeechListener:
+    # Keeps a speech-to-text command running back to back on a thread. The
+    # command returns when the user stops speaking and the next one starts
+    # right away, so commands spoken while the previous one is being handled
+    # are not missed. Transcripts come out of iter() with the time they were
+    # heard.
+
+    def __init__(self, command=("termux-speech-to-text",)):
+        self.command = list(command)
+        self.transcripts = queue.Queue()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, name="speech-listener", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            try:
+                result = subprocess.run(self.command, capture_output=True, text=True)
+            except OSError as e:
+                logger.error(f"Speech listener: {e}")
+                break
+            if result.returncode != 0:
+                logger.error(f"Speech listener: {self.command[0]} exited with {result.returncode}")
+                break
+            transcript = result.stdout.strip()
+            if transcript:
+                self.transcripts.put((transcript, time.monotonic()))
+        self.transcripts.put(None)
+
+    def __iter__(self):
+        while True:
+            item = self.transcripts.get()
+            if item is None:
+                return
+            yield item
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Rejected(Exception):
+    pass
+
+
+class Superseded(Exception):
+    pass
+
+
+class FairPool:
+    # Runs inference jobs on a fixed number of threads. Waiting jobs are
+    # queued per session and the workers serve the sessions round-robin, so
+    # one busy client can't starve the others. A session keeps at most
+    # `per_session` jobs waiting (a newer frame replaces the oldest one), and
+    # with `max_waiting` jobs waiting overall new work is refused instead of
+    # piling up.
+
+    def __init__(self, workers=4, per_session=1, max_waiting=32):
+        self.per_session = per_session
+        self.max_waiting = max_waiting
+        self.queues = OrderedDict()  # session id -> deque of jobs, in serving order
+        self.waiting = 0
+        self.busy = 0
+        self.stats = {"submitted": 0, "completed": 0, "rejected": 0, "superseded": 0}
+        self.condition = threading.Condition()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"inference-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, session_id, fn, *args, **kwargs):
+        future = Future()
+        with self.condition:
+            if self.waiting >= self.max_waiting:
+                self.stats["rejected"] += 1
+                metrics.inc("visionaid_pool_jobs_total", outcome="rejected")
+                raise Rejected(f"{self.waiting} jobs already waiting")
+            jobs = self.queues.setdefault(session_id, deque())
+            if len(jobs) >= self.per_session:
+                superseded, *_ = jobs.popleft()
+                self.waiting -= 1
+                self.stats["superseded"] += 1
+                metrics.inc("visionaid_pool_jobs_total", outcome="superseded")
+                superseded.set_exception(Superseded("superseded by a newer frame"))
+            jobs.append((future, time.monotonic(), fn, args, kwargs))
+            self.waiting += 1
+            self.stats["submitted"] += 1
+            self.condition.notify()
+        return future
+
+    def _next_job(self):
+        with self.condition:
+            while not self.waiting:
+                self.condition.wait()
+            session_id, jobs = next(iter(self.queues.items()))
+            job = jobs.popleft()
+            self.waiting -= 1
+            # The session goes to the back of the line, or away if it is done
+            if jobs:
+                self.queues.move_to_end(session_id)
+            else:
+                del self.queues[session_id]
+            self.busy += 1
+            return job
+
+    def _run(self):
+        while True:
+            future, queued_at, fn, args, kwargs = self._next_job()
+            metrics.observe("visionaid_stage_seconds", time.monotonic() - queued_at, stage="pool_wait")
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except Exception as e:
+                        logger.error(f"Inference pool: Job failed: {e}")
+                        future.set_exception(e)
+            finally:
+                with self.condition:
+                    self.busy -= 1
+                    self.stats["completed"] += 1
+                metrics.inc("visionaid_pool_jobs_total", outcome="completed")